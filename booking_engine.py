@@ -0,0 +1,45 @@
+import threading
+from contextlib import contextmanager
+
+
+class BookingEngine:
+    """
+    Fine-grained locking for the booking transactions.
+    A transaction locks the club (its points) and the competitions it
+    books (their places), so bookings of different clubs for different
+    competitions run in parallel.
+    The club lock is always taken first and the competition locks in
+    name order, so two transactions can't wait on each other.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def lock(self, kind, key):
+        """
+        Return the lock of a club or competition, created on first use.
+        """
+        lock = self._locks.get((kind, key))
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault((kind, key), threading.Lock())
+        return lock
+
+    @contextmanager
+    def transaction(self, club_id, competition_ids):
+        """
+        Hold the locks of the club and of the competitions.
+        :param club_id: email of the club
+        :param competition_ids: names of the competitions
+        """
+        locks = [self.lock('club', club_id)]
+        locks += [self.lock('competition', competition_id)
+                  for competition_id in sorted(set(competition_ids))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from support_booking import JsonArrayReader, replace_json_array
+
+
+class BookingJournal:
+    """
+    Append-only journal of the booking records.
+    Every booking, or batch of bookings with the new points of the clubs
+    and places of the competitions, is written as one JSON line at the
+    end of the journal. The snapshot (booking_places.json) is only
+    rewritten on compaction.
+    :param snapshot_path: path of the booking_places.json snapshot
+    :param journal_path: path of the append-only journal
+    :param fsync: 'always' to fsync after every record, 'never' to let
+    the OS flush, or an integer N to fsync every N records
+    :param compact_every: number of journal records that triggers a
+    compaction into the snapshot (0 disables it)
+    :param before_compact: called with the journal before a compaction,
+    to save the club points and competition places of the journal
+    """
+
+    def __init__(self, snapshot_path, journal_path,
+                 fsync='always', compact_every=1000, before_compact=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self.before_compact = before_compact
+        self.clubs = {}
+        self.competitions = {}
+        self.booked_by_day = {}
+        self.generation = 0
+        self.pending = 0
+        self._unsynced = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Replay the snapshot and the tail of the journal, streaming, into
+        the total of places booked by club and competition.
+        Return the dict of the places by (club email, competition name)
+        and the number of bookings.
+        The club points and competition places of the journal are
+        collected in the clubs and competitions dicts, the places booked
+        by day in booked_by_day.
+        """
+        booked = defaultdict(int)
+        by_day = defaultdict(int)
+
+        def add(booking):
+            booked[(booking['club_id'], booking['competition_id'])] += \
+                booking['places']
+            if 'date' in booking:
+                by_day[booking['date'][:10]] += booking['places']
+
+        count = 0
+        snapshot = {}
+        for booking in self._read_snapshot(snapshot):
+            add(booking)
+            count += 1
+        self.generation = snapshot['generation']
+        self.clubs, self.competitions = {}, {}
+        self.pending = 0
+        for booking in self._replay(self.generation, update=True):
+            add(booking)
+            self.pending += 1
+        self.booked_by_day = dict(by_day)
+        return dict(booked), count + self.pending
+
+    def records(self):
+        """
+        Return an iterator on every booking record of the snapshot and of
+        the journal, reading them as they go.
+        Both files are opened first, under the lock. A compaction during
+        the reading replaces them with new files, the records are still
+        read from the ones opened.
+        """
+        with self._lock:
+            files = self._open_for_reading()
+        return self._records(*files)
+
+    def _open_for_reading(self):
+        return tuple(open(path) if os.path.exists(path) else None
+                     for path in (self.snapshot_path, self.journal_path))
+
+    def _records(self, snapshot, journal):
+        try:
+            found = {'generation': 0}
+            if snapshot is not None:
+                yield from self._read_snapshot(found, snapshot)
+            if journal is not None:
+                yield from self._replay(found['generation'], journal=journal)
+        finally:
+            for f in (snapshot, journal):
+                if f is not None:
+                    f.close()
+
+    def append(self, record):
+        """
+        Write one booking record at the end of the journal.
+        """
+        with self._lock:
+            self._write(record, 1)
+
+    def append_batch(self, bookings, clubs, competitions):
+        """
+        Write bookings with the new points of the clubs and places of the
+        competitions as one line, so they are saved all together or not.
+        :param bookings: list of serialized bookings
+        :param clubs: dict of the points by club email
+        :param competitions: dict of the places by competition name
+        """
+        with self._lock:
+            self.clubs.update(clubs)
+            self.competitions.update(competitions)
+            self._write({'bookings': bookings,
+                         'clubs': clubs,
+                         'competitions': competitions}, len(bookings))
+
+    def _write(self, entry, bookings_count):
+        journal = self._open()
+        journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        journal.flush()
+        self._unsynced += 1
+        if self._must_sync():
+            os.fsync(journal.fileno())
+            self._unsynced = 0
+        self.pending += bookings_count
+        if self.compact_every and self.pending >= self.compact_every:
+            self._compact()
+
+    def compact(self):
+        """
+        Merge the journal into a new snapshot and start a new,
+        empty journal.
+        """
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _must_sync(self):
+        if self.fsync == 'always':
+            return True
+        if self.fsync == 'never':
+            return False
+        return self._unsynced >= int(self.fsync)
+
+    def _open(self):
+        if self._file is None:
+            if self._journal_generation() != self.generation:
+                # Missing journal, or one already merged in the snapshot
+                self._reset_journal()
+            else:
+                self._drop_partial_tail()
+            self._file = open(self.journal_path, 'a')
+        return self._file
+
+    def _drop_partial_tail(self):
+        with open(self.journal_path, 'rb+') as f:
+            content = f.read()
+            if not content.endswith(b'\n'):
+                f.truncate(content.rfind(b'\n') + 1)
+
+    def _journal_generation(self):
+        if not os.path.exists(self.journal_path):
+            return None
+        with open(self.journal_path) as f:
+            header = f.readline()
+        if not header.endswith('\n'):
+            return None
+        return json.loads(header).get('generation')
+
+    def _reset_journal(self):
+        """
+        Start an empty journal of the current generation, as a new file:
+        the records being exported keep reading the old one.
+        """
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w') as journal:
+            journal.write(json.dumps({'generation': self.generation}) +
+                          '\n')
+        os.replace(tmp_path, self.journal_path)
+
+    def _read_snapshot(self, found, snapshot=None):
+        """
+        Yield the records of the snapshot, then set found['generation']
+        to the generation of the journal merged in it.
+        :param snapshot: the snapshot file already open, else its path is
+        opened
+        """
+        found['generation'] = 0
+        if snapshot is None and not os.path.exists(self.snapshot_path):
+            return
+        reader = JsonArrayReader(snapshot or self.snapshot_path,
+                                 'booking_places')
+        yield from reader
+        found['generation'] = reader.fields.get('journal_generation', 0)
+
+    def _read_journal(self, generation, journal=None):
+        """
+        Yield the records of the journal.
+        A journal written before the last compaction is skipped, and a
+        partially written last line (crash during an append) is ignored.
+        :param journal: the journal file already open, else its path is
+        opened
+        """
+        if journal is None:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path) as f:
+                    yield from self._read_journal(generation, f)
+            return
+        header = journal.readline()
+        if not header.endswith('\n') or \
+                json.loads(header).get('generation') != generation:
+            return
+        for line in journal:
+            if not line.endswith('\n'):
+                break
+            yield json.loads(line)
+
+    def _replay(self, generation, update=False, journal=None):
+        """
+        Yield the bookings of the journal.
+        :param update: collect the club points and competition places
+        :param journal: the journal file already open
+        """
+        for entry in self._read_journal(generation, journal):
+            if 'bookings' not in entry:
+                yield entry
+                continue
+            if update:
+                self.clubs.update(entry['clubs'])
+                self.competitions.update(entry['competitions'])
+            yield from entry['bookings']
+
+    def _compact(self):
+        if self.before_compact is not None:
+            self.before_compact(self)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        generation = self.generation + 1
+        # The records are streamed from the old snapshot and the journal
+        # into the new snapshot, never all in memory
+        replace_json_array(self.snapshot_path,
+                           {'journal_generation': generation},
+                           'booking_places',
+                           self._records(*self._open_for_reading()))
+        self.generation = generation
+        # The snapshot now holds every record, a crash before the journal
+        # is reset is harmless: the old generation is skipped on replay.
+        self._reset_journal()
+        self.pending = 0
+        self.clubs, self.competitions = {}, {}
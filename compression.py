@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import brotli
+from flask import request
+
+# Encodings by order of preference at equal quality
+ENCODINGS = ('br', 'gzip')
+COMPRESSIBLE = ('text/', 'application/json', 'application/javascript',
+                'image/svg+xml')
+
+
+def negotiate(accept_encodings):
+    """
+    Return the best encoding of ENCODINGS accepted by the client, or
+    None for the identity.
+    :param accept_encodings: request.accept_encodings
+    """
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding, best=False):
+    """
+    Compress body in encoding, at the best level for the pages
+    compressed once, or a fast level for the others.
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if best else 5)
+    return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+
+class CompressedPage:
+    """
+    Rendered page kept with its compressed variants, each compressed
+    once on first request. Each variant has its own ETag.
+    :param body: rendered page, bytes
+    :param threshold: smaller bodies are not compressed
+    """
+
+    def __init__(self, body, threshold=500):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.threshold = threshold
+        self._variants = {}
+
+    def variant(self, encoding):
+        """
+        Return the (body, encoding, etag) to send to a client accepting
+        encoding, the identity when the page is too small.
+        """
+        if encoding is None or len(self.body) < self.threshold:
+            return self.body, None, self.etag
+        body = self._variants.get(encoding)
+        if body is None:
+            body = self._variants[encoding] = compress(self.body, encoding,
+                                                       best=True)
+        return body, encoding, f'{self.etag}-{encoding}'
+
+
+class Compression:
+    """
+    Compress the responses of at least threshold bytes in the encoding
+    negotiated with Accept-Encoding, Brotli or gzip.
+    The streamed responses and the ones already encoded, such as the
+    CompressedPage variants, are left as they are. An ETag becomes weak
+    once compressed, so the client's If-None-Match still matches the
+    ETag of the identity body.
+    :param threshold: minimum size of a compressed body, 0 disables it
+    """
+
+    def __init__(self, threshold=500):
+        self.threshold = threshold
+
+    def init_app(self, app):
+        if self.threshold:
+            app.after_request(self.compress_response)
+
+    def compress_response(self, response):
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or not response.mimetype.startswith(COMPRESSIBLE)):
+            return response
+        encoding = negotiate(request.accept_encodings)
+        body = response.get_data()
+        if encoding is None or len(body) < self.threshold:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,80 @@
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+RESET = (0, 'event: reset\ndata: {}\n\n')
+
+
+class Broadcaster:
+    """
+    Publish small JSON events to the Server-Sent Events subscribers.
+    The last history events are kept, so a client reconnecting with the
+    id of the last event it got receives the ones it missed, or a reset
+    event when they are not kept anymore.
+    :param history: number of events kept for the reconnections
+    :param heartbeat: seconds of silence before a keep-alive comment
+    """
+
+    def __init__(self, history=1000, heartbeat=15):
+        self.heartbeat = heartbeat
+        self.last_id = 0
+        self._history = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event, data):
+        with self._lock:
+            self.last_id = next(self._ids)
+            message = (self.last_id,
+                       f'id: {self.last_id}\nevent: {event}\n'
+                       f'data: {json.dumps(data, separators=(",", ":"))}'
+                       f'\n\n')
+            self._history.append(message)
+            for subscriber in self._subscribers:
+                subscriber.put(message)
+
+    def subscribe(self, last_id=None):
+        """
+        Return a queue receiving the next events, starting with the
+        events published after last_id.
+        """
+        subscriber = queue.SimpleQueue()
+        with self._lock:
+            if last_id is not None and last_id != self.last_id:
+                oldest = self._history[0][0] if self._history else None
+                if last_id > self.last_id or oldest is None or \
+                        last_id < oldest - 1:
+                    # Restarted server or events no longer kept
+                    subscriber.put(RESET)
+                else:
+                    for message in self._history:
+                        if message[0] > last_id:
+                            subscriber.put(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, last_id=None):
+        """
+        Generate the text of the event stream until the client leaves.
+        """
+        subscriber = self.subscribe(last_id)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    _, text = subscriber.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    text = ': keep-alive\n\n'
+                yield text
+        finally:
+            self.unsubscribe(subscriber)
+
+    def __len__(self):
+        return len(self._subscribers)
@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from flask import Response, before_render_template, g, request
+from flask import template_rendered
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0, 2.5, 5.0)
+NO_TIMER = nullcontext()
+
+
+class Histogram:
+    """
+    Prometheus-like histogram: count of the observed values by bucket,
+    with their sum and count.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Request and hot-path timings, exposed in the Prometheus text format
+    on /metrics.
+    The request hooks and the /metrics route are only registered when
+    enabled, and timer() returns a shared no-op context manager when
+    disabled, so the instrumentation costs next to nothing once off.
+    :param enabled: collect the timings
+    """
+    REQUEST = 'gudlft_request_duration_seconds'
+    STAGE = 'gudlft_stage_duration_seconds'
+    HELP = {REQUEST: 'Duration of the requests by route.',
+            STAGE: 'Duration of the storage, validation and rendering '
+                   'steps.'}
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._end_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def observe(self, name, labels, seconds):
+        """
+        Add a duration to the histogram of the metric and labels.
+        :param labels: tuple of (label, value) pairs
+        """
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram()
+            histogram.observe(seconds)
+
+    def set_gauge(self, name, value, help):
+        """
+        Set a value exposed as it is, such as the startup time.
+        """
+        with self._lock:
+            self._gauges[name] = (value, help)
+
+    def timer(self, stage):
+        """
+        Context manager timing a stage of the request.
+        """
+        if not self.enabled:
+            return NO_TIMER
+        return self._timer(stage)
+
+    @contextmanager
+    def _timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(self.STAGE, (('stage', stage),),
+                         time.perf_counter() - start)
+
+    def render(self):
+        """
+        Return the histograms in the Prometheus text format.
+        """
+        with self._lock:
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count)
+                for key, h in self._histograms.items())
+            gauges = sorted(self._gauges.items())
+        lines = []
+        for name, (value, help) in gauges:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        current = None
+        for (name, labels), counts, total, count in histograms:
+            if name != current:
+                current = name
+                lines.append(f'# HELP {name} {self.HELP[name]}')
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket'
+                             f'{format_labels(labels, le=bound)} '
+                             f'{cumulative}')
+            lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} '
+                         f'{count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(),
+                        mimetype='text/plain; version=0.0.4')
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+
+    def _end_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            labels = (('route', request.endpoint or 'unknown'),
+                      ('method', request.method),
+                      ('status', str(response.status_code)))
+            self.observe(self.REQUEST, labels, time.perf_counter() - start)
+        return response
+
+    def _start_render(self, sender, template, context, **extra):
+        g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+    def _end_render(self, sender, template, context, **extra):
+        renders = g.get('metrics_renders')
+        if renders:
+            self.observe(self.STAGE,
+                         (('stage', 'render'), ('template', template.name)),
+                         time.perf_counter() - renders.pop())
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    values = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"'))
+        for key, value in pairs)
+    return '{' + values + '}'
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class Club:
+    """
+    Club typed once at load time, points is an int.
+    """
+    __slots__ = ('name', 'email', 'points')
+
+    def __init__(self, name, email, points):
+        self.name = name
+        self.email = email
+        self.points = int(points)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['name'], data['email'], data['points'])
+
+    def to_json(self):
+        """
+        Return the club in the format of clubs.json.
+        """
+        return {'name': self.name,
+                'email': self.email,
+                'points': str(self.points)}
+
+    def get_id(self):
+        return self.email
+
+    def __eq__(self, other):
+        if not isinstance(other, Club):
+            return NotImplemented
+        return self.to_json() == other.to_json()
+
+    def __repr__(self):
+        return f'Club({self.name!r}, {self.email!r}, {self.points!r})'
+
+
+class Competition:
+    """
+    Competition typed once at load time, date is a datetime and
+    numberOfPlaces an int.
+    """
+    __slots__ = ('name', 'date', 'numberOfPlaces')
+
+    def __init__(self, name, date, numberOfPlaces):
+        self.name = name
+        if not isinstance(date, datetime):
+            date = datetime.strptime(date, DATE_FORMAT)
+        self.date = date
+        self.numberOfPlaces = int(numberOfPlaces)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['name'], data['date'], data['numberOfPlaces'])
+
+    def to_json(self):
+        """
+        Return the competition in the format of competitions.json.
+        """
+        return {'name': self.name,
+                'date': self.date.strftime(DATE_FORMAT),
+                'numberOfPlaces': str(self.numberOfPlaces)}
+
+    def get_id(self):
+        return self.name
+
+    def __eq__(self, other):
+        if not isinstance(other, Competition):
+            return NotImplemented
+        return self.to_json() == other.to_json()
+
+    def __repr__(self):
+        return (f'Competition({self.name!r}, {self.date!r}, '
+                f'{self.numberOfPlaces!r})')
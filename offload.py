@@ -0,0 +1,25 @@
+"""
+Offloading of the blocking storage I/O.
+The calls run inline by default. The gevent server hands them to the
+thread pool of its hub, so a greenlet waiting for a file or the
+database does not stall the other connections.
+"""
+_pool = None
+
+
+def run_blocking(func, *args):
+    """
+    Run func(*args) in the thread pool, if any, and return its result.
+    """
+    if _pool is None:
+        return func(*args)
+    return _pool.apply(func, args)
+
+
+def use_pool(pool):
+    """
+    Send the blocking calls to pool, an object with an apply(func, args)
+    method such as gevent's ThreadPool, or run them inline with None.
+    """
+    global _pool
+    _pool = pool
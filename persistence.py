@@ -0,0 +1,121 @@
+import logging
+import threading
+from offload import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """
+    Write-behind buffer of the bookings for the booking journal.
+    The requests only add their booking to the buffer, a background
+    thread writes the buffered bookings with the new points of the
+    changed clubs and places of the changed competitions as one journal
+    batch, every flush_interval seconds or once batch_size bookings
+    are waiting.
+    :param journal: BookingJournal receiving the batches
+    :param flush_interval: seconds between two flushes, 0 writes every
+    booking immediately
+    :param batch_size: number of bookings that triggers a flush
+    """
+
+    def __init__(self, journal, flush_interval=0.5, batch_size=100):
+        self.journal = journal
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._bookings = []
+        self._clubs = {}
+        self._competitions = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        # Started here, in the thread or greenlet creating the buffer: a
+        # thread started from the I/O pool of the gevent server would be
+        # a greenlet of the hub of a pool thread, which never runs
+        if self.flush_interval:
+            self._start()
+
+    def add(self, booking, clubs, competitions):
+        """
+        Buffer a serialized booking with the new values it leads to.
+        :param clubs: dict of the points by club email
+        :param competitions: dict of the places by competition name
+        """
+        self.add_many([booking], clubs, competitions)
+
+    def add_many(self, bookings, clubs, competitions):
+        """
+        Buffer serialized bookings with the new values they lead to,
+        they are written in the same journal batch.
+        """
+        with self._lock:
+            self._bookings.extend(bookings)
+            self._clubs.update(clubs)
+            self._competitions.update(competitions)
+            full = len(self._bookings) >= self.batch_size
+        if not self.flush_interval:
+            # The request reports a failed write, it is not retried
+            self.flush(keep_failed=False)
+            return
+        if full:
+            self._wakeup.set()
+
+    def flush(self, keep_failed=True):
+        """
+        Write the buffered bookings, clubs and competitions.
+        When the write fails they are put back in the buffer, before the
+        ones added since, for the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                bookings, self._bookings = self._bookings, []
+                clubs, self._clubs = self._clubs, {}
+                competitions, self._competitions = self._competitions, {}
+            if not (bookings or clubs or competitions):
+                return
+            try:
+                run_blocking(self.journal.append_batch, bookings, clubs,
+                             competitions)
+            except Exception:
+                if keep_failed:
+                    with self._lock:
+                        self._bookings[:0] = bookings
+                        self._clubs = {**clubs, **self._clubs}
+                        self._competitions = {**competitions,
+                                              **self._competitions}
+                raise
+
+    def close(self):
+        """
+        Stop the background thread and write what is still buffered.
+        """
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __len__(self):
+        return len(self._bookings)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run,
+                                                    name='write-behind',
+                                                    daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Writing %d bookings failed, retrying in '
+                                 '%s s', len(self), self.flush_interval)
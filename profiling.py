@@ -0,0 +1,85 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import time
+
+
+class RequestProfiler:
+    """
+    WSGI middleware running single requests under cProfile.
+    Only the requests sent with the header "X-Profile: <token>" are
+    profiled, the profile is saved in the directory and its file name
+    returned in the X-Profile-File header. With the header
+    "X-Profile-Summary: 1" the response is replaced by the top call
+    sites of the profile, sorted by cumulative time.
+    :param app: WSGI application, ex: app.wsgi_app
+    :param token: secret expected in the X-Profile header
+    :param directory: where the .prof files are saved
+    :param top: number of call sites in the summary
+    """
+
+    def __init__(self, app, token, directory='profiles', top=30):
+        self.app = app
+        self.token = token
+        self.directory = directory
+        self.top = top
+
+    def __call__(self, environ, start_response):
+        if not self.authorized(environ):
+            return self.app(environ, start_response)
+
+        response = {}
+        body = []
+
+        def capture(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+            return body.append
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            result = self.app(environ, capture)
+            try:
+                body.extend(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            profile.disable()
+
+        filename = self.save(profile, environ)
+        if environ.get('HTTP_X_PROFILE_SUMMARY') == '1':
+            summary = self.summary(profile).encode()
+            start_response('200 OK', [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('Content-Length', str(len(summary))),
+                ('X-Profile-File', filename)])
+            return [summary]
+        start_response(response['status'],
+                       response['headers'] + [('X-Profile-File', filename)])
+        return body
+
+    def authorized(self, environ):
+        header = environ.get('HTTP_X_PROFILE')
+        return bool(self.token and header) and \
+            hmac.compare_digest(header, self.token)
+
+    def save(self, profile, environ):
+        os.makedirs(self.directory, exist_ok=True)
+        path = re.sub(r'[^A-Za-z0-9]+', '_',
+                      environ.get('PATH_INFO', '')).strip('_') or 'root'
+        filename = (f"{time.strftime('%Y%m%d-%H%M%S')}-"
+                    f"{environ['REQUEST_METHOD']}-{path}-"
+                    f"{time.perf_counter_ns() % 10 ** 6}.prof")
+        profile.dump_stats(os.path.join(self.directory, filename))
+        return filename
+
+    def summary(self, profile):
+        output = io.StringIO()
+        stats = pstats.Stats(profile, stream=output)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        return output.getvalue()
@@ -0,0 +1,181 @@
+import math
+import sqlite3
+import threading
+import time
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+from cache import LRUCache
+from offload import run_blocking
+
+BUCKETS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    stamp REAL NOT NULL
+);
+'''
+
+
+def take_token(tokens, stamp, now, rate, burst):
+    """
+    Refill a bucket since stamp and take a token from it.
+    Return the tokens left and 0 when the token was taken, else the
+    tokens and the seconds until the next token.
+    """
+    tokens = min(burst, tokens + max(0.0, now - stamp) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class TokenBuckets:
+    """
+    Token buckets of one process: each key starts with burst tokens,
+    refilled at rate tokens per second, and each request takes one.
+    Only the most recently used keys are kept, a forgotten key starts
+    again with a full bucket.
+    :param rate: tokens added per second
+    :param burst: size of a bucket
+    :param maxsize: number of keys kept
+    """
+
+    def __init__(self, rate, burst, maxsize=10000):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """
+        Take a token for key. Return 0 when it was taken, else the
+        seconds until the next token.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (self.burst, now))
+            tokens, wait = take_token(tokens, stamp, now, self.rate,
+                                      self.burst)
+            self._buckets.set(key, (tokens, now))
+        return wait
+
+
+class SQLiteTokenBuckets:
+    """
+    Token buckets in a SQLite database, shared by the worker processes.
+    Each take is one transaction, the buckets full again are deleted
+    every prune_every takes.
+    :param path: path of the database file
+    :param rate: tokens added per second
+    :param burst: size of a bucket
+    """
+
+    def __init__(self, path, rate, burst, prune_every=1000):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.prune_every = prune_every
+        self._takes = 0
+        self._local = threading.local()
+        self.connection().executescript(BUCKETS_SCHEMA)
+
+    def connection(self):
+        """
+        Return the connection of the current thread, opened on first use.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key):
+        """
+        Take a token for key. Return 0 when it was taken, else the
+        seconds until the next token.
+        """
+        return run_blocking(self._take, key, time.time())
+
+    def _take(self, key, now):
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, stamp FROM buckets WHERE key = ?',
+                (key,)).fetchone()
+            tokens, stamp = row or (self.burst, now)
+            tokens, wait = take_token(tokens, stamp, now, self.rate,
+                                      self.burst)
+            conn.execute('INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            self._takes += 1
+            if self._takes % self.prune_every == 0:
+                conn.execute('DELETE FROM buckets WHERE stamp < ?',
+                             (now - self.burst / self.rate,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+class RateLimiter:
+    """
+    Token-bucket limits on some endpoints, with a bucket per client IP
+    and one per club email, so a single club or script can't flood them.
+    The requests over a limit get a 429 Too Many Requests with a
+    Retry-After header.
+    :param buckets: TokenBuckets or SQLiteTokenBuckets
+    :param endpoints: names of the limited endpoints
+    :param identify: function returning the email of the club making
+    the request, or None
+    """
+
+    def __init__(self, buckets, endpoints, identify):
+        self.buckets = buckets
+        self.endpoints = frozenset(endpoints)
+        self.identify = identify
+
+    def init_app(self, app):
+        app.before_request(self.check)
+
+    def check(self):
+        if request.endpoint not in self.endpoints:
+            return
+        wait = self.buckets.take(f'ip:{request.remote_addr}')
+        email = self.identify()
+        if email:
+            wait = max(wait, self.buckets.take(f'email:{email}'))
+        if wait:
+            raise TooManyRequests(retry_after=math.ceil(wait))
+
+
+class AdmissionControl:
+    """
+    WSGI middleware answering an immediate 429 Too Many Requests over a
+    number of requests running at once, so the latency stays flat for
+    the admitted requests instead of collapsing for everyone.
+    A slot is held until the application returns its response: the
+    pages are rendered by then, while the streams, such as the /events
+    of the live updates, don't hold one as long as they are open.
+    :param app: WSGI application, ex: app.wsgi_app
+    :param limit: maximum number of requests running at once
+    :param retry_after: seconds sent in the Retry-After header
+    """
+
+    def __init__(self, app, limit, retry_after=1):
+        self.app = app
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def __call__(self, environ, start_response):
+        if not self._slots.acquire(blocking=False):
+            return TooManyRequests(retry_after=self.retry_after)(
+                environ, start_response)
+        try:
+            return self.app(environ, start_response)
+        finally:
+            self._slots.release()
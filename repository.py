@@ -0,0 +1,206 @@
+import itertools
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+# Versions are unique across the repositories, a cache keyed on a version
+# never serves the data of another repository
+_versions = itertools.count(1)
+
+
+class Repository:
+    """
+    In-memory store of the clubs, competitions and bookings.
+    It keeps dict indexes on the club email, the club name and the
+    competition name, and a running total of the places booked by each
+    club for each competition, so lookups don't scan the lists. The
+    booking records themselves are left to the storage, only counted,
+    with the totals of the reports: places sold by competition, points
+    spent by club and places booked by day.
+    competitions_version and clubs_version change every time the places
+    of a competition or the points of a club change, for the caches of
+    the rendered pages. The version of the points of each club is the id
+    of its last booking, the same in every worker sharing the storage.
+    """
+
+    def __init__(self, clubs, competitions, bookings=(), booked=None,
+                 bookings_count=0, booked_by_day=None,
+                 points_versions=None):
+        """
+        :param bookings: iterable of serialized bookings
+        :param booked: dict of the places already booked by (club email,
+        competition name), as loaded by the storage
+        :param bookings_count: number of bookings counted in booked
+        :param booked_by_day: dict of the places booked by day of the
+        bookings counted in booked
+        :param points_versions: dict of the versions of the points by
+        club email, as kept by the storage. The other clubs share a
+        version unique to this repository until their next booking.
+        """
+        self.clubs = clubs
+        self.competitions = competitions
+        self.booked = defaultdict(int, booked or {})
+        self.bookings_count = bookings_count
+        self.sold = defaultdict(int)
+        self.spent = defaultdict(int)
+        for (club_id, competition_id), places in self.booked.items():
+            self.sold[competition_id] += places
+            self.spent[club_id] += places
+        self.booked_by_day = defaultdict(int, booked_by_day or {})
+        self.points_versions = dict(points_versions or {})
+        # Unique across the processes and their restarts, unlike
+        # _versions, as the versions end up in the session cookies
+        self.loaded_version = uuid.uuid4().hex
+        # The bookings of different clubs and competitions are applied
+        # concurrently, the count and the days are shared by all of them
+        self._count_lock = threading.Lock()
+        for booking in bookings:
+            self.add_booking(booking)
+        self.competitions_version = next(_versions)
+        self.clubs_version = next(_versions)
+        self.clubs_modified = time.time()
+        self.reindex()
+
+    def reindex(self):
+        """
+        Build the indexes from the lists of clubs and competitions.
+        """
+        self.clubs_by_email = {club.email: club for club in self.clubs}
+        self.clubs_by_name = {club.name: club for club in self.clubs}
+        self.competitions_by_name = {competition.name: competition
+                                     for competition in self.competitions}
+        self.competitions_by_date = sorted(self.competitions,
+                                           key=lambda c: c.date)
+        self.competition_dates = [c.date for c in self.competitions_by_date]
+
+    def club_by_email(self, email):
+        return self.clubs_by_email.get(email)
+
+    def club_by_name(self, name):
+        return self.clubs_by_name.get(name)
+
+    def competition_by_name(self, name):
+        return self.competitions_by_name.get(name)
+
+    def list_competitions(self, page=1, per_page=20, start=None, end=None,
+                          has_places=False):
+        """
+        Return one page of the competitions sorted by date, and whether
+        there is a next page.
+        The date range is found by bisection in the date index, so a page
+        costs its size (plus the full competitions skipped with
+        has_places), not the number of competitions.
+        :param start: first datetime of the range
+        :param end: last datetime of the range
+        :param has_places: only the competitions with places left
+        """
+        dates = self.competition_dates
+        low = 0 if start is None else bisect_left(dates, start)
+        high = len(dates) if end is None else bisect_right(dates, end)
+        skip = (page - 1) * per_page
+        if not has_places:
+            first = low + skip
+            found = self.competitions_by_date[first:min(first + per_page + 1,
+                                                        high)]
+        else:
+            found = []
+            for index in range(low, high):
+                competition = self.competitions_by_date[index]
+                if competition.numberOfPlaces < 1:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                found.append(competition)
+                if len(found) > per_page:
+                    break
+        return found[:per_page], len(found) > per_page
+
+    def booked_places(self, club_id, competition_id):
+        """
+        Total of places already booked by the club for the competition.
+        """
+        return self.booked.get((club_id, competition_id), 0)
+
+    def apply_booking(self, club, competition, booking):
+        """
+        Take the points of the club and the places of the competition
+        for a serialized booking, and add it.
+        """
+        self.set_points(club, club.points - booking['places'], booking['id'])
+        self.set_places(competition,
+                        competition.numberOfPlaces - booking['places'])
+        self.add_booking(booking)
+
+    def points_version(self, club_id):
+        return self.points_versions.get(club_id, self.loaded_version)
+
+    def set_points(self, club, points, version=None):
+        """
+        :param version: new version of the points, the id of the booking
+        that changed them
+        """
+        if version is not None:
+            self.points_versions[club.email] = version
+        if club.points != points:
+            club.points = points
+            self.clubs_version = next(_versions)
+            self.clubs_modified = time.time()
+
+    def set_places(self, competition, places):
+        if competition.numberOfPlaces != places:
+            competition.numberOfPlaces = places
+            self.competitions_version = next(_versions)
+
+    def add_booking(self, booking):
+        """
+        Count a serialized booking in the booked places total and in the
+        totals of the reports.
+        """
+        club_id, competition_id = booking['club_id'], booking['competition_id']
+        places = booking['places']
+        self.booked[(club_id, competition_id)] += places
+        self.sold[competition_id] += places
+        self.spent[club_id] += places
+        with self._count_lock:
+            self.bookings_count += 1
+            if 'date' in booking:
+                self.booked_by_day[booking['date'][:10]] += places
+
+    def set_booked_by_day(self, day, places):
+        """
+        Set the places booked on the day, as read from a storage shared
+        with other processes.
+        """
+        with self._count_lock:
+            self.booked_by_day[day] = places
+
+    def set_booked(self, club_id, competition_id, places):
+        """
+        Set the places booked by the club for the competition, as read
+        from a storage shared with other processes.
+        """
+        change = places - self.booked.get((club_id, competition_id), 0)
+        self.booked[(club_id, competition_id)] = places
+        self.sold[competition_id] += change
+        self.spent[club_id] += change
+
+
+class PendingBookings:
+    """
+    Places booked by a bulk request, validated but not applied yet, seen
+    on top of the places booked in the repository.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.booked = defaultdict(int)
+
+    def booked_places(self, club_id, competition_id):
+        return self.repository.booked_places(club_id, competition_id) + \
+            self.booked[(club_id, competition_id)]
+
+    def add(self, club_id, competition_id, places):
+        self.booked[(club_id, competition_id)] += places
@@ -0,0 +1,44 @@
+"""
+High-concurrency server: the app served by gevent in one process.
+
+    python serve.py --host 0.0.0.0 --port 5000 --threads 10
+
+Every connection is a greenlet, so thousands of idle keep-alive clients
+only cost memory, and the storage I/O runs in the thread pool of the
+hub. The settings are read from the FLASK_* variables as with flask run.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import time  # noqa: E402
+from gevent import get_hub  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+import offload  # noqa: E402
+
+# Show the startup report of the server module
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+IMPORT_START = time.perf_counter()
+from server import app  # noqa: E402
+logging.info('Imported the app in %.3f s',
+             time.perf_counter() - IMPORT_START)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=10,
+                        help='threads running the storage I/O')
+    args = parser.parse_args(argv)
+    pool = get_hub().threadpool
+    pool.maxsize = args.threads
+    offload.use_pool(pool)
+    server = WSGIServer((args.host, args.port), app)
+    print(f'Serving on http://{args.host}:{args.port}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
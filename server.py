@@ -1,32 +1,109 @@
+import atexit
+import csv
+import functools
+import hashlib
+import io
+import itertools
 import json
+import os
 import uuid
+from datetime import datetime, time
+from time import perf_counter
+import click
 from flask import Flask, render_template, request, redirect, flash, url_for
-from flask import make_response
+from flask import Response, g, make_response, session
+from markupsafe import Markup, escape
+from werkzeug.datastructures import MultiDict
 from flask_login import LoginManager, UserMixin, login_required
 from flask_login import logout_user, login_user, current_user
-from support_booking import write_json
+from jinja2 import FileSystemBytecodeCache
+from booking_journal import BookingJournal
+from repository import PendingBookings, Repository
+from cache import LRUCache
+from booking_engine import BookingEngine
+from storage import JsonStorage
+from sqlite_storage import SQLiteStorage
+from models import Club, Competition, DATE_FORMAT
+from metrics import Metrics
+from offload import run_blocking
+from live_updates import Broadcaster
+from waitlist import Waitlist
+from profiling import RequestProfiler
+from ratelimit import AdmissionControl, RateLimiter, SQLiteTokenBuckets
+from ratelimit import TokenBuckets
+from compression import Compression, CompressedPage, negotiate
 
-
-def load_clubs():
-    with open('clubs.json') as c:
-        listOfClubs = json.load(c)['clubs']
-        return listOfClubs
-
-
-def load_competitions():
-    with open('competitions.json') as comps:
-        listOfCompetitions = json.load(comps)['competitions']
-        return listOfCompetitions
-
-
-def load_bookings():
-    with open('booking_places.json') as book:
-        listOfBookings = json.load(book)['booking_places']
-        return listOfBookings
+# Start of the setup of the app, for the startup time
+STARTED = perf_counter()
+# Maximum places a club can book for one competition
+BOOKING_LIMIT = 12
+# Maximum items of a bulk booking
+BULK_BOOKING_LIMIT = 100
+# Prefix of the JSON API routes, with its version
+API_PREFIX = '/api/v1'
 
 
 app = Flask(__name__)
 app.secret_key = 'something_special'
+app.config.from_mapping(
+    # 'json' for the JSON files, 'sqlite' to share SQLITE_PATH between
+    # several worker processes
+    STORAGE='json',
+    SQLITE_PATH='gudlft.db',
+    CLUBS_FILE='clubs.json',
+    COMPETITIONS_FILE='competitions.json',
+    BOOKINGS_FILE='booking_places.json',
+    BOOKINGS_JOURNAL='booking_places.journal',
+    # 'always', 'never' or fsync every N bookings
+    BOOKINGS_JOURNAL_FSYNC='always',
+    # Merge the journal into BOOKINGS_FILE every N bookings (0 disables)
+    BOOKINGS_COMPACT_EVERY=1000,
+    # Seconds between two writes of the bookings, points and places
+    # (0 writes in the request)
+    PERSIST_FLUSH_INTERVAL=0.5,
+    # Number of bookings waiting that triggers a write
+    PERSIST_BATCH_SIZE=100,
+    # Collect the timings of the requests and expose them on /metrics
+    METRICS_ENABLED=False,
+    # Number of logged in clubs kept by load_user (0 disables the cache)
+    USER_CACHE_SIZE=256,
+    # Read the logged in club from the signed session cookie while the
+    # points of the clubs are unchanged, instead of looking it up. Off by
+    # default: the user cache hit is faster in one process, see
+    # tests/performance/test_auth_benchmark.py
+    SESSION_TOKEN=False,
+    # Profile the requests sent with the header X-Profile: <PROFILE_TOKEN>
+    # (None disables the profiling), the profiles are saved in PROFILE_DIR
+    PROFILE_TOKEN=None,
+    PROFILE_DIR='profiles',
+    # Responses of at least COMPRESSION_MIN_SIZE bytes are sent with Brotli
+    # or gzip to the clients accepting them (0 disables the compression)
+    COMPRESSION_MIN_SIZE=500,
+    # Static files are cached by the browsers for a day
+    SEND_FILE_MAX_AGE_DEFAULT=86400,
+    # Requests per second allowed on the login and booking endpoints for
+    # each client IP and each club, in bursts of RATE_LIMIT_BURST (0
+    # disables the limits). 'memory' keeps the buckets in the process,
+    # 'sqlite' shares them in RATE_LIMIT_SQLITE_PATH between the workers
+    RATE_LIMIT_PER_SECOND=0,
+    RATE_LIMIT_BURST=10,
+    RATE_LIMIT_STORAGE='memory',
+    RATE_LIMIT_SQLITE_PATH='ratelimit.db',
+    # Requests running at once, the next ones get a 429 Too Many
+    # Requests (0 disables the cap)
+    MAX_CONCURRENT_REQUESTS=0,
+    # Compiled templates are cached in TEMPLATE_CACHE_DIR, so a new worker
+    # only reads them (None disables the cache)
+    TEMPLATE_CACHE_DIR='.jinja_cache',
+)
+# Override with FLASK_* environment variables, ex: FLASK_BOOKINGS_FILE
+app.config.from_prefixed_env()
+if app.config['TEMPLATE_CACHE_DIR']:
+    os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+    app.jinja_options = dict(
+        app.jinja_options,
+        bytecode_cache=FileSystemBytecodeCache(
+            app.config['TEMPLATE_CACHE_DIR']))
 login_manager = LoginManager()
 login_manager.init_app(app)
 # Set login view
@@ -34,9 +111,74 @@ login_manager.login_view = 'index'
 # Add session protection
 login_manager.session_protection = "strong"
 
-competitions = load_competitions()
-clubs = load_clubs()
-bookings = load_bookings()
+
+def json_storage(config):
+    journal = BookingJournal(config['BOOKINGS_FILE'],
+                             config['BOOKINGS_JOURNAL'],
+                             fsync=config['BOOKINGS_JOURNAL_FSYNC'],
+                             compact_every=config['BOOKINGS_COMPACT_EVERY'])
+    return JsonStorage(config['CLUBS_FILE'], config['COMPETITIONS_FILE'],
+                       journal,
+                       flush_interval=config['PERSIST_FLUSH_INTERVAL'],
+                       batch_size=config['PERSIST_BATCH_SIZE'])
+
+
+def create_storage(config):
+    """
+    Return the storage backend chosen by the STORAGE setting.
+    """
+    if config['STORAGE'] == 'sqlite':
+        return SQLiteStorage(config['SQLITE_PATH'], BOOKING_LIMIT)
+    return json_storage(config)
+
+
+metrics = Metrics(app.config['METRICS_ENABLED'])
+metrics.init_app(app)
+compression = Compression(app.config['COMPRESSION_MIN_SIZE'])
+compression.init_app(app)
+if app.config['PROFILE_TOKEN']:
+    app.wsgi_app = RequestProfiler(app.wsgi_app, app.config['PROFILE_TOKEN'],
+                                   app.config['PROFILE_DIR'])
+if app.config['MAX_CONCURRENT_REQUESTS']:
+    app.wsgi_app = AdmissionControl(app.wsgi_app,
+                                    app.config['MAX_CONCURRENT_REQUESTS'])
+storage = create_storage(app.config)
+atexit.register(storage.close)
+
+
+def load_store():
+    """
+    Load the repository from the storage and report the startup time.
+    """
+    start = perf_counter()
+    with metrics.timer('storage_load'):
+        clubs = storage.load_clubs()
+        competitions = storage.load_competitions()
+        booked_by_day = storage.load_booked_by_day()
+        points_versions = storage.load_points_versions()
+        booked, bookings_count = storage.load_booked()
+        repository = Repository(clubs, competitions, booked=booked,
+                                bookings_count=bookings_count,
+                                booked_by_day=booked_by_day,
+                                points_versions=points_versions)
+    seconds = perf_counter() - start
+    app.logger.info('Loaded %d clubs, %d competitions and %d bookings in '
+                    '%.3f s', len(clubs), len(competitions), bookings_count,
+                    seconds)
+    metrics.set_gauge('gudlft_storage_load_seconds', seconds,
+                      'Time spent loading the storage at startup.')
+    return repository
+
+
+store = load_store()
+user_cache = LRUCache(app.config['USER_CACHE_SIZE'])
+# Rendered competitions.html by version of the competitions
+fragment_cache = LRUCache(8)
+# Rendered clubs boards by format and version of the clubs
+board_cache = LRUCache(8)
+engine = BookingEngine()
+live = Broadcaster()
+waitlist = Waitlist()
 
 
 class ClubUser(UserMixin):
@@ -49,22 +191,17 @@ class ClubUser(UserMixin):
         return self.email
 
 
-class Competition:
-    def __init__(self, name, numberOfPlaces, date):
-        self.name = name
-        self.numberOfPlaces = numberOfPlaces
-        self.date = date
-
-    def get_id(self):
-        return self.name
-
-
 class BookingEvents:
+    """
+    Booking record, negative places for a cancellation.
+    """
+
     def __init__(self, club_id, competition_id, places):
         self.id = str(uuid.uuid4())
         self.club_id = club_id
         self.competition_id = competition_id
         self.places = places
+        self.date = datetime.now().strftime(DATE_FORMAT)
 
     def get_id(self):
         return self.id
@@ -74,52 +211,292 @@ class BookingEvents:
             'id': str(self.id),
             'club_id': self.club_id,
             'competition_id': self.competition_id,
-            'places': self.places
+            'places': self.places,
+            'date': self.date
         }
 
 
+def sync_store():
+    """
+    Catch up with the changes made by the other workers sharing the
+    storage, when it changed since the last request. Each changed value
+    is read again under the lock of its club or competition, so it
+    can't overwrite a booking of this worker being applied.
+    """
+    if request.endpoint == 'static':
+        return
+    version = storage.sync_version()
+    if version is None:
+        return
+    clubs, competitions, booked, days = storage.changes(store)
+    for club in clubs:
+        with engine.lock('club', club.email):
+            storage.refresh_club(store, club)
+        user_cache.invalidate(club.email)
+    if clubs:
+        # The rate limiter may have loaded the club before the sync
+        g.pop('_login_user', None)
+    for competition in competitions:
+        with engine.lock('competition', competition.name):
+            storage.refresh_competition(store, competition)
+    for club_id, competition_id in booked:
+        with engine.transaction(club_id, [competition_id]):
+            storage.refresh_booked(store, club_id, competition_id)
+    # A day booked by this worker meanwhile may be read before or after
+    # its booking is counted: the version of the booking is past the
+    # synced one, so the next request reads the day again
+    for day in days:
+        storage.refresh_day(store, day)
+    storage.synced(version)
+
+
+@app.before_request
+def note_live_id():
+    """
+    Note the last live event before the request reads the club or the
+    competitions, the welcome page resumes the events from there:
+    replaying a change already shown is harmless, skipping one is not.
+    """
+    g.live_id = live.last_id
+
+
+# Key of the club token in the session: [email, name, points, version of
+# the points of the club]
+SESSION_CLUB = 'club'
+
+
 @login_manager.user_loader
 def load_user(email):
-    clubs = load_clubs()
-    for club in clubs:
-        if club['email'] == email:
-            return ClubUser(club['name'], club['email'], club['points'])
+    """
+    Return the logged in club from the session token when its points
+    have not changed since it was written, else from the user cache or
+    the store, and renew the token.
+    """
+    use_token = app.config['SESSION_TOKEN']
+    if use_token:
+        # Read before the points, a booking in between makes the token
+        # out of date rather than the points
+        version = store.points_version(email)
+        token = session.get(SESSION_CLUB)
+        if token and token[3] == version and token[0] == email:
+            return ClubUser(token[1], email, token[2])
+    user = user_cache.get(email)
+    if user is None:
+        club = store.club_by_email(email)
+        if club is None:
+            return None
+        user = ClubUser(club.name, club.email, club.points)
+        user_cache.set(email, user)
+    if use_token:
+        remember_club(user, version)
+    return user
+
+
+def login_club(club):
+    """
+    Log the club in, with its token in the session.
+    """
+    version = store.points_version(club.email)
+    user = ClubUser(club.name, club.email, club.points)
+    login_user(user)
+    if app.config['SESSION_TOKEN']:
+        remember_club(user, version)
+
+
+def remember_club(user, version):
+    session[SESSION_CLUB] = [user.email, user.name, user.points, version]
+
+
+# Endpoints limited by RATE_LIMIT_PER_SECOND
+RATE_LIMITED_ENDPOINTS = ('show_summary', 'purchase_places',
+                          'purchase_places_bulk', 'join_waitlist',
+                          'cancel_booking', 'api_login', 'api_book',
+                          'api_book_bulk')
+
+
+def create_buckets(config):
+    """
+    Return the token buckets chosen by the RATE_LIMIT_STORAGE setting.
+    """
+    rate = config['RATE_LIMIT_PER_SECOND']
+    burst = config['RATE_LIMIT_BURST']
+    if config['RATE_LIMIT_STORAGE'] == 'sqlite':
+        return SQLiteTokenBuckets(config['RATE_LIMIT_SQLITE_PATH'], rate,
+                                  burst)
+    return TokenBuckets(rate, burst)
+
+
+def request_club_email():
+    """
+    Return the email of the logged in club. The login attempts are
+    limited by IP only: an email sent by anyone can't spend the bucket
+    of its club.
+    """
+    if current_user.is_authenticated:
+        return current_user.email
     return None
 
 
+if app.config['RATE_LIMIT_PER_SECOND']:
+    rate_limiter = RateLimiter(create_buckets(app.config),
+                               RATE_LIMITED_ENDPOINTS, request_club_email)
+    rate_limiter.init_app(app)
+
+# After the rate limiter, the rejected requests don't sync
+app.before_request(sync_store)
+
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    if '_flashes' in session:
+        return render_template('index.html')
+    return cached_page(('index',),
+                       lambda: render_template('index.html'), 'text/html')
+
+
+def cached_page(key, render, mimetype, last_modified=None):
+    """
+    Return a page rendered once per key, and compressed once per
+    encoding, with an ETag so clients get a 304 Not Modified until the
+    key changes.
+    """
+    page = board_cache.get(key)
+    if page is None:
+        threshold = app.config['COMPRESSION_MIN_SIZE'] or float('inf')
+        page = CompressedPage(render().encode(), threshold)
+        board_cache.set(key, page)
+    body, encoding, etag = page.variant(negotiate(request.accept_encodings))
+    response = make_response(body)
+    response.mimetype = mimetype
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def clubs_board(name, render, mimetype):
+    """
+    Return the clubs board rendered once per version of the clubs, with
+    a Last-Modified date, so polling clients get a 304 Not Modified until
+    the points change.
+    """
+    return cached_page((name, store.clubs_version), render, mimetype,
+                       store.clubs_modified)
 
 
 @app.route('/clubs')
 def clubs_list():
-    return render_template('clubs.html', clubs=clubs)
+    return clubs_board(
+        'html', lambda: render_template('clubs.html', clubs=store.clubs),
+        'text/html')
+
+
+@app.route('/clubs.json')
+@app.route(f'{API_PREFIX}/clubs')
+def clubs_json():
+    return clubs_board(
+        'json', lambda: json.dumps(
+            {'clubs': [{'name': club.name, 'points': club.points}
+                       for club in store.clubs]},
+            separators=(',', ':')),
+        'application/json')
 
 
 @app.route('/show_summary', methods=['POST'])
 def show_summary():
     email = request.form['email']
-    if email not in (x['email'] for x in clubs):
+    club = store.club_by_email(email)
+    if club is None:
         flash('Email not found, please try again')
         return redirect(url_for('index'))
-    club = [club for club in clubs if club['email'] == request.form[
-        'email']][0]
 
-    club_user = ClubUser(club['name'], email, club['points'])
-    login_user(club_user)
+    login_club(club)
     return redirect(url_for('welcome'))
 
 
+# Club name rendered in the cached competitions, replaced per request.
+# URL-safe, so url_for leaves it as is.
+CLUB_PLACEHOLDER = '__club__'
+
+
+# Competitions listed by page of the welcome page
+COMPETITIONS_PER_PAGE = 20
+MAX_COMPETITIONS_PER_PAGE = 100
+
+
+def competitions_fragment(club_name, competitions):
+    """
+    Return the rendered list of the competitions for the club.
+    The list is rendered once per version of the competitions, only the
+    club name in the booking links is filled in for each request.
+    """
+    key = (store.competitions_version, tuple(c.name for c in competitions))
+    html = fragment_cache.get(key)
+    if html is None:
+        html = render_template('competitions.html',
+                               competitions=competitions,
+                               club_name=CLUB_PLACEHOLDER)
+        fragment_cache.set(key, html)
+    converter = app.url_map.converters['default'](app.url_map)
+    return Markup(html.replace(CLUB_PLACEHOLDER,
+                               escape(converter.to_url(club_name))))
+
+
+def parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def competition_filters(args):
+    """
+    Read the page and the filters of the competitions from the query
+    string: page, per_page, upcoming=1, available=1, from and to
+    (YYYY-MM-DD). Invalid values are ignored.
+    """
+    start = args.get('from', type=parse_day)
+    end = args.get('to', type=parse_day)
+    if end is not None:
+        end = datetime.combine(end, time.max)
+    if args.get('upcoming') == '1':
+        now = datetime.now()
+        start = now if start is None else max(start, now)
+    per_page = args.get('per_page', COMPETITIONS_PER_PAGE, type=int)
+    return {'page': max(args.get('page', 1, type=int), 1),
+            'per_page': min(max(per_page, 1), MAX_COMPETITIONS_PER_PAGE),
+            'start': start,
+            'end': end,
+            'has_places': args.get('available') == '1'}
+
+
+def render_welcome(club, args=MultiDict()):
+    filters = competition_filters(args)
+    competitions, has_next = store.list_competitions(**filters)
+    page = filters['page']
+    params = args.to_dict()
+    prev_url = next_url = None
+    if page > 1:
+        prev_url = url_for('welcome', **dict(params, page=page - 1))
+    if has_next:
+        next_url = url_for('welcome', **dict(params, page=page + 1))
+    return render_template('welcome.html', club=club,
+                           competitions_html=competitions_fragment(
+                               club.name, competitions),
+                           filters=params,
+                           prev_url=prev_url,
+                           next_url=next_url,
+                           live_id=g.live_id)
+
+
+def current_club():
+    return Club(current_user.name, current_user.email, current_user.points)
+
+
 @app.route('/welcome')
 @login_required
 def welcome():
-
-    club = {'name': current_user.name,
-            'email': current_user.email,
-            'points': current_user.points}
-    response = make_response(render_template(
-        'welcome.html', club=club, competitions=competitions))
+    response = make_response(render_welcome(current_club(), request.args))
     response.headers[
         'Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
     response.headers['Pragma'] = 'no-cache'
@@ -131,18 +508,16 @@ def welcome():
 @app.route('/book/<competition>/<club>')
 @login_required
 def book(competition, club):
-    try:
-        foundClub = [c for c in clubs if c['name'] == club][0]
-        foundCompetition = [c for c in competitions if c['name'] ==
-                            competition][0]
-        return render_template('booking.html',
-                               club=foundClub,
-                               competition=foundCompetition)
-    except Exception:
+    foundClub = store.club_by_name(club)
+    foundCompetition = store.competition_by_name(competition)
+    if foundClub is None or foundCompetition is None:
         flash("Something went wrong-please try again")
-        return render_template('welcome.html',
-                               club=club,
-                               competitions=competitions)
+        return render_welcome(current_club())
+    return render_template('booking.html',
+                           club=foundClub,
+                           competition=foundCompetition,
+                           booked=store.booked_places(foundClub.email,
+                                                      foundCompetition.name))
 
 
 def value_validator(value):
@@ -158,38 +533,398 @@ def value_validator(value):
         return False
 
 
-def validate_booking(places_required, club, competition):
+def validate_booking(places_required, club, competition, repository=None):
     """
     This function is a placeholder for refactoring the booking logic.
     It should handle the logic of booking places in a more structured way.
+    :param repository: places already booked, the store by default
     """
-    if places_required > int(club.get('points')):
+    if places_required > club.points:
         return 'Sorry, you do not have enough points to book this competition'
-    elif int(competition.get('numberOfPlaces')) < 1:
+    elif competition.numberOfPlaces < 1:
         return 'The competition you chose is not available anymore'
-    elif places_required > int(competition.get('numberOfPlaces')):
+    elif places_required > competition.numberOfPlaces:
         return 'Sorry, not enough places available'
-    elif check_booking_limit_club(club.get('email'),
-                                  competition.get('name'),
-                                  bookings, places_required) is False:
+    elif check_booking_limit_club(club.email,
+                                  competition.name,
+                                  repository or store,
+                                  places_required) is False:
         return "You can not book more than 12 places for this competition"
     return None
 
 
 def check_booking_limit_club(club_id, competition_id,
-                             booking_places, places_required):
+                             repository, places_required):
     """
     Check if the club in total can't reserve more than 12 places
     for a specific competition.
     """
-    booked = [b.get('places') for b in booking_places
-              if b['club_id'] == club_id and
-              b['competition_id'] == competition_id]
-    if sum(booked) + places_required > 12:
+    booked = repository.booked_places(club_id, competition_id)
+    if booked + places_required > BOOKING_LIMIT:
         return False
     return True
 
 
+def book_places(club, competition, places_required):
+    """
+    Validate and apply a booking as one transaction, holding the locks
+    of the club and of the competition.
+    Return the error message of the validation, or None once the places
+    are booked.
+    """
+    with engine.transaction(club.email, [competition.name]):
+        with metrics.timer('storage_refresh'):
+            storage.refresh(store, club, competition)
+        with metrics.timer('validate'):
+            check_booking = validate_booking(places_required, club,
+                                             competition)
+        if check_booking:
+            return check_booking
+        booking = BookingEvents(club.email, competition.name,
+                                places_required)
+        record = booking.serialize()
+        with metrics.timer('storage_save'):
+            saved = storage.save_booking(club, competition, record)
+        if not saved:
+            # Another worker changed the club or the competition
+            storage.refresh(store, club, competition)
+            return validate_booking(places_required, club, competition) \
+                or "Something went wrong-please try again"
+        store.apply_booking(club, competition, record)
+        user_cache.invalidate(club.email)
+        publish_changes(club, [competition])
+    return None
+
+
+def validate_bookings(club, items):
+    """
+    Validate the (competition, places) items of a bulk booking, each one
+    against the points, places and booked places left by the valid
+    items before it.
+    Return the error message of every item, None for the valid ones.
+    """
+    pending = PendingBookings(store)
+    points = club.points
+    places = {}
+    errors = []
+    for competition, places_required in items:
+        club_left = Club(club.name, club.email, points)
+        competition_left = Competition(
+            competition.name, competition.date,
+            places.get(competition.name, competition.numberOfPlaces))
+        error = validate_booking(places_required, club_left,
+                                 competition_left, pending)
+        if error is None:
+            points -= places_required
+            places[competition.name] = \
+                competition_left.numberOfPlaces - places_required
+            pending.add(club.email, competition.name, places_required)
+        errors.append(error)
+    return errors
+
+
+def book_many(club, items):
+    """
+    Validate and apply the (competition, places) items of a bulk booking
+    as one transaction with one storage write: all of them or none.
+    Return the error message of every item, None for the valid ones, and
+    whether the places are booked.
+    """
+    competitions = {competition.name: competition
+                    for competition, _ in items}
+    with engine.transaction(club.email, competitions):
+        with metrics.timer('storage_refresh'):
+            for competition in competitions.values():
+                storage.refresh(store, club, competition)
+        with metrics.timer('validate'):
+            errors = validate_bookings(club, items)
+        if any(errors):
+            return errors, False
+        bookings = [(competition,
+                     BookingEvents(club.email, competition.name,
+                                   places_required).serialize())
+                    for competition, places_required in items]
+        with metrics.timer('storage_save'):
+            saved = storage.save_bookings(club, bookings)
+        if not saved:
+            # Another worker changed the club or a competition
+            for competition in competitions.values():
+                storage.refresh(store, club, competition)
+            errors = validate_bookings(club, items)
+            if not any(errors):
+                errors = ["Something went wrong-please try again"] * \
+                    len(items)
+            return errors, False
+        for competition, record in bookings:
+            store.apply_booking(club, competition, record)
+        user_cache.invalidate(club.email)
+        publish_changes(club, competitions.values())
+    return errors, True
+
+
+def parse_bulk_items(data):
+    """
+    Return the (competition, places) items of a bulk booking request, or
+    raise ValueError with the reason it is malformed.
+    """
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty list')
+    if len(items) > BULK_BOOKING_LIMIT:
+        raise ValueError(f'no more than {BULK_BOOKING_LIMIT} items')
+    return [parse_booking_item(item) for item in items]
+
+
+def parse_booking_item(item):
+    """
+    Return the (competition, places) of {"competition": name,
+    "places": n}, or raise ValueError.
+    """
+    if not isinstance(item, dict):
+        raise ValueError('every item must be an object')
+    name = item.get('competition')
+    if not isinstance(name, str):
+        raise ValueError('competition must be a string')
+    competition = store.competition_by_name(name)
+    if competition is None:
+        raise ValueError(f'unknown competition {name}')
+    places = item.get('places')
+    if isinstance(places, bool) or not isinstance(places, int) or \
+            places < 1:
+        raise ValueError('places must be a positive integer')
+    return competition, places
+
+
+@app.route('/purchase_places/bulk', methods=['POST'])
+@login_required
+def purchase_places_bulk():
+    return bulk_booking()
+
+
+def bulk_booking():
+    """
+    Book places in several competitions for the logged in club, from
+    {"items": [{"competition": name, "places": n}, ...]}.
+    The items are booked all together or not at all.
+    """
+    club = store.club_by_email(current_user.email)
+    try:
+        items = parse_bulk_items(request.get_json(silent=True))
+    except ValueError as error:
+        return api_response({'error': str(error)}, 400)
+    errors, booked = book_many(club, items)
+    return api_response({
+        'booked': booked,
+        'points': club.points,
+        'items': [{'competition': competition.name, 'places': places,
+                   'error': error}
+                  for (competition, places), error in zip(items, errors)],
+    }, 200 if booked else 409)
+
+
+def api_response(data, status=200, conditional=False):
+    """
+    Return data as compact JSON. A conditional response gets an ETag and
+    becomes a 304 Not Modified when the client already has it.
+    """
+    body = json.dumps(data, separators=(',', ':')).encode()
+    response = app.response_class(body, status, mimetype='application/json')
+    if conditional:
+        response.set_etag(hashlib.sha1(body).hexdigest())
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+    return response
+
+
+def api_login_required(view):
+    """
+    login_required answering 401 in JSON instead of redirecting to the
+    login page.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return api_response({'error': 'login required'}, 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def club_summary(club):
+    return {'name': club.name, 'email': club.email, 'points': club.points}
+
+
+def competition_summary(competition):
+    return {'name': competition.name,
+            'date': competition.date.strftime(DATE_FORMAT),
+            'places': competition.numberOfPlaces}
+
+
+@app.route(f'{API_PREFIX}/competitions')
+def api_competitions():
+    """
+    Page of the competitions, with the filters of the welcome page.
+    """
+    filters = competition_filters(request.args)
+    competitions, has_next = store.list_competitions(**filters)
+    return api_response({
+        'competitions': [competition_summary(competition)
+                         for competition in competitions],
+        'page': filters['page'],
+        'has_next': has_next,
+    }, conditional=True)
+
+
+@app.route(f'{API_PREFIX}/login', methods=['POST'])
+def api_login():
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    if not isinstance(email, str):
+        return api_response({'error': 'email must be a string'}, 400)
+    club = store.club_by_email(email)
+    if club is None:
+        return api_response({'error': 'Email not found'}, 401)
+    login_club(club)
+    return api_response(club_summary(club))
+
+
+@app.route(f'{API_PREFIX}/summary')
+@api_login_required
+def api_summary():
+    return api_response(club_summary(store.club_by_email(current_user.email)),
+                        conditional=True)
+
+
+@app.route(f'{API_PREFIX}/bookings', methods=['POST'])
+@api_login_required
+def api_book():
+    """
+    Book places for the logged in club, from {"competition": name,
+    "places": n}, as purchase_places does.
+    """
+    club = store.club_by_email(current_user.email)
+    try:
+        competition, places = parse_booking_item(
+            request.get_json(silent=True))
+    except ValueError as error:
+        return api_response({'error': str(error)}, 400)
+    error = book_places(club, competition, places)
+    if error:
+        return api_response({'booked': False, 'error': error}, 409)
+    return api_response({'booked': True,
+                         'points': club.points,
+                         'competition': competition_summary(competition)},
+                        201)
+
+
+@app.route(f'{API_PREFIX}/bookings/bulk', methods=['POST'])
+@api_login_required
+def api_book_bulk():
+    return bulk_booking()
+
+
+# Columns and rows by chunk of the CSV export of the bookings
+EXPORT_FIELDS = ('id', 'date', 'club_id', 'competition_id', 'places')
+EXPORT_CHUNK_ROWS = 1000
+
+
+@app.route(f'{API_PREFIX}/reports/competitions')
+@api_login_required
+def report_competitions():
+    """
+    Places sold and left by competition, from the totals of the store.
+    """
+    return api_response({'competitions': [
+        {'name': competition.name,
+         'date': competition.date.strftime(DATE_FORMAT),
+         'places_sold': store.sold.get(competition.name, 0),
+         'places_left': competition.numberOfPlaces}
+        for competition in store.competitions]}, conditional=True)
+
+
+@app.route(f'{API_PREFIX}/reports/clubs')
+@api_login_required
+def report_clubs():
+    """
+    Points spent and left by club, from the totals of the store.
+    """
+    return api_response({'clubs': [
+        {'name': club.name,
+         'points_spent': store.spent.get(club.email, 0),
+         'points': club.points}
+        for club in store.clubs]}, conditional=True)
+
+
+@app.route(f'{API_PREFIX}/reports/days')
+@api_login_required
+def report_days():
+    """
+    Places booked by day, cancellations deducted.
+    """
+    return api_response({'days': [
+        {'day': day, 'places': places}
+        for day, places in sorted(store.booked_by_day.items())]},
+        conditional=True)
+
+
+@app.route(f'{API_PREFIX}/reports/bookings.csv')
+@api_login_required
+def export_bookings():
+    """
+    Every booking record as CSV, streamed from the storage.
+    """
+    response = Response(csv_chunks(storage.iter_bookings()),
+                        mimetype='text/csv')
+    response.headers['Content-Disposition'] = \
+        'attachment; filename=bookings.csv'
+    return response
+
+
+def csv_chunks(bookings, size=EXPORT_CHUNK_ROWS):
+    """
+    Yield the serialized bookings as CSV, size rows at a time, so a
+    large export never holds the history in memory. The rows are read
+    in the I/O thread pool when there is one, not in the server loop.
+    """
+    output = io.StringIO()
+    writer = csv.DictWriter(output, EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    while True:
+        rows = run_blocking(list, itertools.islice(bookings, size))
+        writer.writerows(rows)
+        chunk = output.getvalue()
+        if chunk:
+            yield chunk
+        if len(rows) < size:
+            return
+        output.seek(0)
+        output.truncate()
+
+
+def publish_changes(club, competitions):
+    """
+    Push the new points of the club and places of the competitions to
+    the pages listening to /events.
+    """
+    live.publish('points', {'club': club.name, 'points': club.points})
+    for competition in competitions:
+        live.publish('places', {'competition': competition.name,
+                                'places': competition.numberOfPlaces})
+
+
+@app.route('/events')
+def live_events():
+    """
+    Server-Sent Events stream of the points and places changes, resumed
+    after the Last-Event-ID header or the last_id argument.
+    """
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_id', type=int)
+    return Response(live.stream(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no'})
+
+
 @app.route('/purchase_places', methods=['POST'])
 @login_required
 def purchase_places():
@@ -200,36 +935,237 @@ def purchase_places():
                                club=request.form['club'],
                                competition=request.form['competition'],
                                message=msg)
-    competition = [c for c in competitions if c['name'] == request.form[
-        'competition']][0]
-
-    club = [c for c in clubs if c['name'] == request.form['club']][0]
+    competition = store.competition_by_name(request.form['competition'])
+    club = store.club_by_name(request.form['club'])
+    if club is None or competition is None:
+        flash("Something went wrong-please try again")
+        return render_welcome(current_club())
 
     placesRequired = int(request.form['places'])
-    check_booking = validate_booking(placesRequired,
-                                     club,
-                                     competition)
+    check_booking = book_places(club, competition, placesRequired)
     if check_booking:
         return render_template('booking.html',
                                club=club,
                                competition=competition,
-                               message=check_booking)
-
-    club['points'] = int(club.get('points')) - placesRequired
-    new_val_competition = int(competition['numberOfPlaces'])-placesRequired
-    competition['numberOfPlaces'] = new_val_competition
-    booking = BookingEvents(club['email'], competition['name'], placesRequired)
-    bookings.append(booking.serialize())
-    write_json('booking_places.json', bookings)
+                               message=check_booking,
+                               booked=store.booked_places(club.email,
+                                                          competition.name),
+                               waitlist_offer=check_booking
+                               in WAITLIST_MESSAGES,
+                               places=placesRequired)
 
     flash('Great-booking complete!')
-    return render_template('welcome.html',
-                           club=club,
-                           competitions=competitions)
+    return render_welcome(club)
+
+
+# Refusals that can be waited out on the waitlist
+WAITLIST_MESSAGES = {'Sorry, not enough places available',
+                     'The competition you chose is not available anymore'}
+
+
+def cancel_places(club, competition, places):
+    """
+    Cancel places booked by the club as one transaction: the club gets
+    its points back and the competition its places.
+    Return the error message, or None once cancelled.
+    """
+    with engine.transaction(club.email, [competition.name]):
+        storage.refresh(store, club, competition)
+        booked = store.booked_places(club.email, competition.name)
+        if places > booked:
+            return (f'You have only {booked} places booked for this '
+                    f'competition')
+        record = BookingEvents(club.email, competition.name,
+                               -places).serialize()
+        if not storage.save_booking(club, competition, record):
+            return "Something went wrong-please try again"
+        store.apply_booking(club, competition, record)
+        user_cache.invalidate(club.email)
+        publish_changes(club, [competition])
+    return None
+
+
+def waitlist_error(places, club, competition):
+    """
+    Return why the club can't wait for the places of the competition,
+    whatever places are released: not enough points or over the limit
+    of places by club. None when it can.
+    """
+    if places > club.points:
+        return 'Sorry, you do not have enough points to book this competition'
+    if check_booking_limit_club(club.email, competition.name, store,
+                                places) is False:
+        return "You can not book more than 12 places for this competition"
+    return None
+
+
+def fill_waitlist(competition):
+    """
+    Book the free places of the competition for the waiting clubs, in
+    turn, as long as the first one fits. The clubs that can't book
+    their places anymore are dropped. Each club gets one waitlist event
+    with the outcome.
+    """
+    with engine.lock('waitlist', competition.name):
+        while True:
+            first = waitlist.first(competition.name)
+            if first is None:
+                return
+            email, places = first
+            club = store.club_by_email(email)
+            if club is None:
+                waitlist.leave(competition.name, email)
+                continue
+            # A club out of points or over its limit would block the
+            # clubs behind it forever, it is dropped with the reason
+            error = waitlist_error(places, club, competition)
+            if error is None:
+                if places > competition.numberOfPlaces:
+                    return
+                error = book_places(club, competition, places)
+            waitlist.leave(competition.name, email)
+            live.publish('waitlist', {'club': club.name,
+                                      'competition': competition.name,
+                                      'places': places,
+                                      'error': error})
+
+
+def form_booking():
+    """
+    Return the logged in club, the competition and the places of the
+    form, or None when one of them is invalid.
+    """
+    club = store.club_by_email(current_user.email)
+    competition = store.competition_by_name(request.form.get('competition'))
+    places = request.form.get('places', '')
+    if club is None or competition is None or not value_validator(places):
+        return None
+    return club, competition, int(places)
+
+
+@app.route('/waitlist', methods=['POST'])
+@login_required
+def join_waitlist():
+    booking = form_booking()
+    if booking is None:
+        flash("Something went wrong-please try again")
+        return render_welcome(current_club())
+    club, competition, places = booking
+    error = waitlist_error(places, club, competition)
+    if error:
+        flash(error)
+        return render_welcome(club)
+    waiting = waitlist.join(competition.name, club.email, places)
+    flash(f'You are on the waitlist of {competition.name} for {places} '
+          f'places, {waiting} clubs waiting')
+    # Places may have been released since the booking was refused
+    fill_waitlist(competition)
+    return render_welcome(club)
+
+
+@app.route('/cancel_places', methods=['POST'])
+@login_required
+def cancel_booking():
+    booking = form_booking()
+    if booking is None:
+        flash("Something went wrong-please try again")
+        return render_welcome(current_club())
+    club, competition, places = booking
+    error = cancel_places(club, competition, places)
+    if error:
+        return render_template('booking.html',
+                               club=club,
+                               competition=competition,
+                               message=error,
+                               booked=store.booked_places(club.email,
+                                                          competition.name))
+    fill_waitlist(competition)
+    flash(f'{places} places cancelled')
+    return render_welcome(club)
 
 
 @app.route('/logout')
 @login_required
 def logout():
     logout_user()
+    session.pop(SESSION_CLUB, None)
     return redirect(url_for('index'))
+
+
+@app.cli.command('import-json')
+def import_json():
+    """
+    Import the clubs, competitions and bookings of the JSON files into
+    the SQLite database.
+    """
+    source = json_storage(app.config)
+    database = SQLiteStorage(app.config['SQLITE_PATH'], BOOKING_LIMIT)
+    clubs = source.load_clubs()
+    competitions = source.load_competitions()
+    _, bookings_count = source.load_booked()
+    database.import_data(clubs, competitions, source.iter_bookings())
+    click.echo(f"Imported {len(clubs)} clubs, {len(competitions)} "
+               f"competitions and {bookings_count} bookings into "
+               f"{app.config['SQLITE_PATH']}")
+
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """
+    Compile the templates into a fresh TEMPLATE_CACHE_DIR, ex: when
+    building a release.
+    """
+    cache = app.jinja_env.bytecode_cache
+    if cache is None:
+        raise click.ClickException('TEMPLATE_CACHE_DIR is not set')
+    cache.clear()
+    app.jinja_env.cache.clear()
+    count, seconds = compile_templates()
+    click.echo(f"Compiled {count} templates in {seconds:.3f} s into "
+               f"{app.config['TEMPLATE_CACHE_DIR']}")
+
+
+def compile_templates():
+    """
+    Compile every template, read from the bytecode cache when it has
+    them. Return the number of templates and the time taken.
+    """
+    start = perf_counter()
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), perf_counter() - start
+
+
+# Startup report, filled by the warm-up
+startup = {}
+
+
+def warm_up():
+    """
+    Compile the templates before the first requests, once the store is
+    loaded, then report the startup time.
+    """
+    count, seconds = compile_templates()
+    metrics.set_gauge('gudlft_template_compile_seconds', seconds,
+                      'Time spent compiling the templates at startup.')
+    startup['seconds'] = perf_counter() - STARTED
+    metrics.set_gauge('gudlft_startup_seconds', startup['seconds'],
+                      'Time spent setting up the app, storage load and '
+                      'warm-up included.')
+    app.logger.info('Compiled %d templates in %.3f s, started in %.3f s',
+                    count, seconds, startup['seconds'])
+
+
+@app.route('/ready')
+def ready():
+    """
+    Readiness probe with the startup time. The data load and the warm-up
+    run when the module is imported, before any server accepts a
+    connection, so a worker answering is warmed up.
+    """
+    return api_response({'ready': True,
+                         'startup_seconds': round(startup['seconds'], 3)})
+
+
+warm_up()
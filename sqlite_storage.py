@@ -0,0 +1,396 @@
+import sqlite3
+import threading
+import uuid
+from models import Club, Competition, DATE_FORMAT
+from offload import run_blocking
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS clubs (
+    email TEXT PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    points INTEGER NOT NULL,
+    points_version TEXT
+);
+CREATE TABLE IF NOT EXISTS competitions (
+    name TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    places INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bookings (
+    id TEXT PRIMARY KEY,
+    club_id TEXT NOT NULL,
+    competition_id TEXT NOT NULL,
+    places INTEGER NOT NULL,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS bookings_club_competition
+    ON bookings (club_id, competition_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER NOT NULL,
+    club_id TEXT,
+    competition_id TEXT,
+    day TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_version ON changes (version);
+'''
+# Bumped by every transaction changing the data
+BUMP_VERSION = "UPDATE meta SET value = value + 1 WHERE key = 'version'"
+SELECT_VERSION = "SELECT value FROM meta WHERE key = 'version'"
+# Change log: the (club, competition, day) booked at each version, all
+# NULL when anything may have changed, ex: an import
+RECORD_CHANGE = 'INSERT INTO changes VALUES (?, ?, ?, ?)'
+# Created once the date column is added to the older databases
+DAY_INDEX = ('CREATE INDEX IF NOT EXISTS bookings_day '
+             'ON bookings (substr(date, 1, 10))')
+# Columns added since the first databases
+ADDED_COLUMNS = (('bookings', 'date'), ('clubs', 'points_version'),
+                 ('changes', 'day'))
+# Versions kept in the change log, a worker further behind scans it all
+CHANGES_KEPT = 10000
+# The version of the points of a club is the id of its last booking
+TAKE_POINTS = ('UPDATE clubs SET points = points - ?, points_version = ? '
+               'WHERE email = ? AND points >= ?')
+BOOKING_VALUES = ('bookings (id, club_id, competition_id, places, date) '
+                  'VALUES (?, ?, ?, ?, ?)')
+TAKE_PLACES = ('UPDATE competitions SET places = places - ? '
+               'WHERE name = ? AND places >= ?')
+
+
+class SQLiteStorage:
+    """
+    Storage backend on a SQLite database in WAL mode, shared by all the
+    worker processes.
+    Each thread keeps its own connection. A booking is saved in one
+    transaction that only succeeds if the club still has the points,
+    the competition the places and the club is under its places limit,
+    so workers with stale memory can't oversell.
+    Every transaction bumps the version of the database, so a worker
+    finds out with one query whether the others changed the data since
+    it last synced its memory, and records the club and competitions it
+    booked in the change log, so the worker reads only those again.
+    :param path: path of the database file
+    :param club_limit: maximum places of a club for a competition
+    """
+
+    def __init__(self, path, club_limit=12):
+        self.path = path
+        self.club_limit = club_limit
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        for table, column in ADDED_COLUMNS:
+            columns = [row[1] for row in
+                       conn.execute(f'PRAGMA table_info({table})')]
+            if column not in columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} TEXT')
+        conn.execute(DAY_INDEX)
+        self._synced = conn.execute(SELECT_VERSION).fetchone()[0]
+
+    def connection(self):
+        """
+        Return the connection of the current thread, opened on first use.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def load_clubs(self):
+        rows = self.connection().execute(
+            'SELECT name, email, points FROM clubs ORDER BY rowid')
+        return [Club(name, email, points) for name, email, points in rows]
+
+    def load_competitions(self):
+        rows = self.connection().execute(
+            'SELECT name, date, places FROM competitions ORDER BY rowid')
+        return [Competition(name, date, places)
+                for name, date, places in rows]
+
+    def load_booked(self):
+        """
+        Return the dict of the places booked by (club email, competition
+        name) and the number of bookings.
+        """
+        conn = self.connection()
+        rows = conn.execute(
+            'SELECT club_id, competition_id, SUM(places) FROM bookings '
+            'GROUP BY club_id, competition_id')
+        booked = {(club_id, competition_id): places
+                  for club_id, competition_id, places in rows}
+        count = conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0]
+        return booked, count
+
+    def load_points_versions(self):
+        """
+        Return the dict of the versions of the points by club email, ''
+        for the clubs never booked since the import.
+        """
+        rows = self.connection().execute(
+            "SELECT email, COALESCE(points_version, '') FROM clubs")
+        return dict(rows.fetchall())
+
+    def load_booked_by_day(self):
+        """
+        Return the dict of the places booked by day, 'YYYY-MM-DD', of the
+        bookings recorded with their date.
+        """
+        rows = self.connection().execute(
+            'SELECT substr(date, 1, 10), SUM(places) FROM bookings '
+            'WHERE date IS NOT NULL GROUP BY 1')
+        return dict(rows.fetchall())
+
+    def iter_bookings(self):
+        """
+        Yield the serialized bookings, fetched as they go.
+        """
+        rows = self.connection().execute(
+            'SELECT id, club_id, competition_id, places, date FROM bookings '
+            'ORDER BY rowid')
+        for id, club_id, competition_id, places, date in rows:
+            booking = {'id': id, 'club_id': club_id,
+                       'competition_id': competition_id, 'places': places}
+            if date is not None:
+                booking['date'] = date
+            yield booking
+
+    def refresh(self, repository, club, competition):
+        """
+        Update the club points, the competition places and the places
+        booked by the club with the values of the database, which may
+        have been changed by another worker.
+        """
+        run_blocking(self._refresh, repository, club, competition)
+
+    def _refresh(self, repository, club, competition):
+        self._refresh_club(repository, club)
+        self._refresh_competition(repository, competition)
+        self._refresh_booked(repository, club.email, competition.name)
+
+    def refresh_day(self, repository, day):
+        run_blocking(self._refresh_day, repository, day)
+
+    def refresh_club(self, repository, club):
+        run_blocking(self._refresh_club, repository, club)
+
+    def refresh_competition(self, repository, competition):
+        run_blocking(self._refresh_competition, repository, competition)
+
+    def refresh_booked(self, repository, club_id, competition_id):
+        run_blocking(self._refresh_booked, repository, club_id,
+                     competition_id)
+
+    def _refresh_club(self, repository, club):
+        row = self.connection().execute(
+            "SELECT points, COALESCE(points_version, '') FROM clubs "
+            "WHERE email = ?", (club.email,)).fetchone()
+        if row is not None:
+            repository.set_points(club, *row)
+
+    def _refresh_competition(self, repository, competition):
+        places = self.connection().execute(
+            'SELECT places FROM competitions WHERE name = ?',
+            (competition.name,)).fetchone()
+        if places is not None:
+            repository.set_places(competition, places[0])
+
+    def _refresh_day(self, repository, day):
+        repository.set_booked_by_day(day, self.connection().execute(
+            'SELECT COALESCE(SUM(places), 0) FROM bookings '
+            'WHERE substr(date, 1, 10) = ?', (day,)).fetchone()[0])
+
+    def _refresh_booked(self, repository, club_id, competition_id):
+        repository.set_booked(
+            club_id, competition_id,
+            self._booked_places(self.connection(), club_id, competition_id))
+
+    def sync_version(self):
+        """
+        Return the version of the database when it changed since the
+        last synced one, else None.
+        """
+        version = run_blocking(
+            lambda: self.connection().execute(SELECT_VERSION).fetchone()[0])
+        return None if version == self._synced else version
+
+    def synced(self, version):
+        """
+        Record the memory of the process is up to date with version.
+        """
+        self._synced = max(self._synced, version)
+
+    def changes(self, repository):
+        """
+        Return the clubs, the competitions, the (club email, competition
+        name) booked totals and the days of the repository changed in the
+        database since the last synced version, from the change log.
+        The clubs and competitions added to the database since the
+        startup are not loaded.
+        """
+        return run_blocking(self._changes, repository)
+
+    def _changes(self, repository):
+        conn = self.connection()
+        oldest = conn.execute('SELECT MIN(version) FROM changes').fetchone()[0]
+        if oldest is None or oldest > self._synced + 1:
+            # The versions since the last sync were pruned from the log
+            return self._scan_changes(repository)
+        rows = conn.execute(
+            'SELECT DISTINCT club_id, competition_id, day FROM changes '
+            'WHERE version > ?', (self._synced,)).fetchall()
+        if any(club_id is None for club_id, _, _ in rows):
+            return self._scan_changes(repository)
+        booked = list({(club_id, competition_id)
+                       for club_id, competition_id, _ in rows})
+        clubs = {club_id for club_id, _ in booked}
+        competitions = {competition_id for _, competition_id in booked}
+        return ([club for club in map(repository.club_by_email, clubs)
+                 if club is not None],
+                [competition for competition in
+                 map(repository.competition_by_name, competitions)
+                 if competition is not None],
+                booked,
+                list({day for _, _, day in rows if day is not None}))
+
+    def _scan_changes(self, repository):
+        """
+        Compare every club, competition, booked total and day of the
+        repository with the database.
+        """
+        conn = self.connection()
+        clubs, competitions, booked = [], [], []
+        for email, points in conn.execute('SELECT email, points FROM clubs'):
+            club = repository.club_by_email(email)
+            if club is not None and club.points != points:
+                clubs.append(club)
+        for name, places in conn.execute(
+                'SELECT name, places FROM competitions'):
+            competition = repository.competition_by_name(name)
+            if competition is not None and \
+                    competition.numberOfPlaces != places:
+                competitions.append(competition)
+        for club_id, competition_id, places in conn.execute(
+                'SELECT club_id, competition_id, SUM(places) FROM bookings '
+                'GROUP BY club_id, competition_id'):
+            if repository.booked_places(club_id, competition_id) != places:
+                booked.append((club_id, competition_id))
+        booked_by_day = self.load_booked_by_day()
+        days = [day for day in booked_by_day.keys() |
+                repository.booked_by_day.keys()
+                if repository.booked_by_day.get(day, 0) !=
+                booked_by_day.get(day, 0)]
+        return clubs, competitions, booked, days
+
+    def save_booking(self, club, competition, booking):
+        """
+        Take the points and the places and save a serialized booking.
+        Return False, without any change, when the database no longer
+        allows the booking.
+        """
+        return self.save_bookings(club, [(competition, booking)])
+
+    def save_bookings(self, club, items):
+        """
+        Save serialized bookings in one transaction, all of them or none.
+        :param items: list of (competition, booking)
+        """
+        return run_blocking(self._save_bookings, items)
+
+    def _save_bookings(self, items):
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for _, booking in items:
+                if not self._take(conn, booking):
+                    conn.execute('ROLLBACK')
+                    return False
+                conn.execute(f'INSERT INTO {BOOKING_VALUES}',
+                             (booking['id'], booking['club_id'],
+                              booking['competition_id'], booking['places'],
+                              booking.get('date')))
+            version = conn.execute(SELECT_VERSION).fetchone()[0]
+            conn.execute(BUMP_VERSION)
+            conn.executemany(RECORD_CHANGE, {
+                (version + 1, booking['club_id'], booking['competition_id'],
+                 booking['date'][:10] if booking.get('date') else None)
+                for _, booking in items})
+            conn.execute('DELETE FROM changes WHERE version <= ?',
+                         (version + 1 - CHANGES_KEPT,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        # Only this booking changed the data since the last sync, and it
+        # is applied to the memory by the caller
+        if version == self._synced:
+            self._synced = version + 1
+        return True
+
+    def import_data(self, clubs, competitions, bookings):
+        """
+        Import the clubs, competitions and bookings, replacing the rows
+        with the same keys.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # The imported points get a new version
+            conn.executemany(
+                'INSERT OR REPLACE INTO clubs VALUES (?, ?, ?, ?)',
+                [(c.email, c.name, c.points, uuid.uuid4().hex)
+                 for c in clubs])
+            conn.executemany(
+                'INSERT OR REPLACE INTO competitions VALUES (?, ?, ?)',
+                [(c.name, c.date.strftime(DATE_FORMAT), c.numberOfPlaces)
+                 for c in competitions])
+            conn.executemany(
+                f'INSERT OR REPLACE INTO {BOOKING_VALUES}',
+                ((b['id'], b['club_id'], b['competition_id'], b['places'],
+                  b.get('date')) for b in bookings))
+            conn.execute(BUMP_VERSION)
+            conn.execute(RECORD_CHANGE, (
+                conn.execute(SELECT_VERSION).fetchone()[0], None, None,
+                None))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _take(self, conn, booking):
+        """
+        Take the points and the places of a booking, if still allowed.
+        A cancellation, with negative places, gives them back.
+        """
+        places = booking['places']
+        booked = self._booked_places(conn, booking['club_id'],
+                                     booking['competition_id']) + places
+        return (
+            0 <= booked <= self.club_limit
+            and conn.execute(TAKE_POINTS, (places, booking['id'],
+                                           booking['club_id'],
+                                           places)).rowcount == 1
+            and conn.execute(TAKE_PLACES,
+                             (places, booking['competition_id'],
+                              places)).rowcount == 1)
+
+    @staticmethod
+    def _booked_places(conn, club_id, competition_id):
+        return conn.execute(
+            'SELECT COALESCE(SUM(places), 0) FROM bookings '
+            'WHERE club_id = ? AND competition_id = ?',
+            (club_id, competition_id)).fetchone()[0]
@@ -0,0 +1,154 @@
+import json
+from models import Club, Competition
+from persistence import WriteBehind
+from support_booking import replace_json
+
+
+class JsonStorage:
+    """
+    Storage backend on the JSON files.
+    The clubs and competitions are read from their JSON documents, the
+    bookings are kept in the booking journal. The bookings and the
+    changed club points and competition places are written behind the
+    requests, in journal batches, and saved back to clubs.json and
+    competitions.json when the journal is compacted.
+    :param clubs_path: path of clubs.json
+    :param competitions_path: path of competitions.json
+    :param journal: BookingJournal of the bookings
+    :param flush_interval: seconds between two writes of the bookings
+    :param batch_size: number of bookings that triggers a write
+    """
+
+    def __init__(self, clubs_path, competitions_path, journal,
+                 flush_interval=0.5, batch_size=100):
+        self.clubs_path = clubs_path
+        self.competitions_path = competitions_path
+        self.journal = journal
+        self.journal.before_compact = self.save_state
+        self.writer = WriteBehind(journal, flush_interval, batch_size)
+        self._booked = None
+
+    def load_clubs(self):
+        with open(self.clubs_path) as c:
+            listOfClubs = json.load(c)['clubs']
+        self._replay()
+        points = self.journal.clubs
+        for club in listOfClubs:
+            if club['email'] in points:
+                club['points'] = points[club['email']]
+        return [Club.from_json(club) for club in listOfClubs]
+
+    def load_competitions(self):
+        with open(self.competitions_path) as comps:
+            listOfCompetitions = json.load(comps)['competitions']
+        self._replay()
+        places = self.journal.competitions
+        for competition in listOfCompetitions:
+            if competition['name'] in places:
+                competition['numberOfPlaces'] = places[competition['name']]
+        return [Competition.from_json(competition)
+                for competition in listOfCompetitions]
+
+    def load_booked_by_day(self):
+        """
+        Return the dict of the places booked by day, 'YYYY-MM-DD', of the
+        bookings recorded with their date.
+        """
+        self._replay()
+        return self.journal.booked_by_day
+
+    def load_points_versions(self):
+        """
+        Return the dict of the versions of the points by club email. The
+        files don't keep them, the clubs start again with the version of
+        the new repository.
+        """
+        return {}
+
+    def load_booked(self):
+        """
+        Return the dict of the places booked by (club email, competition
+        name) and the number of bookings. The last of the loads, it
+        releases the replayed journal.
+        """
+        self._replay()
+        booked, self._booked = self._booked, None
+        return booked
+
+    def iter_bookings(self):
+        """
+        Yield the serialized bookings, read from the files as they go.
+        """
+        self.writer.flush()
+        return self.journal.records()
+
+    def refresh(self, repository, club, competition):
+        """
+        Nothing to do, the memory of the process is the source of truth.
+        """
+
+    def sync_version(self):
+        """
+        None, no other process changes the data.
+        """
+        return None
+
+    def save_booking(self, club, competition, booking):
+        """
+        Save a serialized booking, before the club and the competition
+        are updated in memory.
+        Return False when the storage refused the booking.
+        """
+        return self.save_bookings(club, [(competition, booking)])
+
+    def save_bookings(self, club, items):
+        """
+        Save serialized bookings of the club in one journal batch, before
+        the club and the competitions are updated in memory.
+        :param items: list of (competition, booking)
+        """
+        points = club.points
+        places = {}
+        for competition, booking in items:
+            points -= booking['places']
+            places[competition.name] = places.get(
+                competition.name, competition.numberOfPlaces) - \
+                booking['places']
+        self.writer.add_many([booking for _, booking in items],
+                             {club.email: points}, places)
+        return True
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        self.journal.close()
+
+    def save_state(self, journal):
+        """
+        Save the club points and competition places of the journal in
+        clubs.json and competitions.json.
+        """
+        if journal.clubs:
+            self._save_values(self.clubs_path, 'clubs', 'email', 'points',
+                              journal.clubs)
+        if journal.competitions:
+            self._save_values(self.competitions_path, 'competitions',
+                              'name', 'numberOfPlaces', journal.competitions)
+
+    def _save_values(self, path, key, id_field, field, values):
+        with open(path) as f:
+            data = json.load(f)
+        for item in data[key]:
+            if item[id_field] in values:
+                # The JSON files keep the numbers as strings
+                item[field] = str(values[item[id_field]])
+        replace_json(path, data, indent=4)
+
+    def _replay(self):
+        """
+        Replay the journal once for all the loads.
+        """
+        if self._booked is None:
+            self._booked = self.journal.load()
@@ -1,4 +1,8 @@
 import json
+import os
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
 
 
 def write_json(path, list_dict):
@@ -13,3 +17,131 @@ def write_json(path, list_dict):
     }
     with open(path, 'w') as f:
         json.dump(wrapped_data, f, indent=2)
+
+
+def replace_json(path, data, indent=2):
+    '''
+    Write the data in a temporary file and rename it to the path,
+    so the document is either the old one or the new one, never
+    partially written.
+    :param path: json path
+    :param data: dictionary to save
+    '''
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JsonArrayReader:
+    '''
+    Read the items of one array of a JSON document by chunks, so the
+    memory used doesn't grow with the size of the file.
+    The document is an object, the other members are kept in fields
+    once the items are read.
+    :param path: json path, or a file already open for reading
+    :param key: name of the array, ex: booking_places
+    :param chunk_size: number of characters read at once
+    '''
+
+    def __init__(self, path, key, chunk_size=1 << 16):
+        self.path = path
+        self.key = key
+        self.chunk_size = chunk_size
+        self.fields = {}
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        if hasattr(self.path, 'read'):
+            yield from self._read(self.path)
+            return
+        with open(self.path) as f:
+            yield from self._read(f)
+
+    def _read(self, f):
+        self._file = f
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._expect('{')
+        while self._peek() != '}':
+            name = self._value()
+            self._expect(':')
+            if self._peek() == '[' and name == self.key:
+                yield from self._items()
+            else:
+                self.fields[name] = self._value()
+            if self._peek() == ',':
+                self._pos += 1
+
+    def _items(self):
+        self._expect('[')
+        while self._peek() != ']':
+            yield self._value()
+            if self._peek() == ',':
+                self._pos += 1
+        self._pos += 1
+
+    def _fill(self):
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError(f'{self.path}: unexpected end of file')
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f'{self.path}: {char!r} expected')
+        self._pos += 1
+
+    def _value(self):
+        # Called after _peek, the value starts at _pos
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                value, end = None, None
+            # A value ending with the buffer may continue in the next chunk
+            if end is not None and (end < len(self._buffer) or self._eof):
+                self._pos = end
+                return value
+            if not self._fill():
+                if end is not None:
+                    self._pos = end
+                    return value
+                raise ValueError(f'{self.path}: invalid JSON value')
+
+
+def replace_json_array(path, fields, key, items):
+    '''
+    Write the fields and the array of items under key as a JSON object,
+    item by item, then rename it to the path as replace_json does.
+    :param items: iterable of the array items, consumed as they are
+    written
+    '''
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write('{')
+        for name, value in fields.items():
+            f.write(f'{json.dumps(name)}: {json.dumps(value)}, ')
+        f.write(f'{json.dumps(key)}: [')
+        separator = '\n  '
+        for item in items:
+            f.write(separator + json.dumps(item))
+            separator = ',\n  '
+        f.write('\n]}\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,37 @@
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta
+import server
+from server import app
+from repository import Repository
+import pytest
+
+NEXT_YEAR = (datetime.now() + timedelta(days=365)).replace(microsecond=0)
+
+
+@pytest.fixture()
+def make_client():
+    """
+    Fixture to provide a function patching the store with the clubs,
+    competitions and serialized bookings given, and the storage with a
+    mock accepting every booking. The function returns a test client,
+    the store and the storage, app.test_client() gives more clients on
+    them. The user cache is emptied before and after the test.
+    """
+    server.user_cache.clear()
+    app.config['TESTING'] = True
+
+    def make(clubs, competitions, bookings=()):
+        store = Repository(clubs, competitions, bookings)
+        storage = MagicMock()
+        storage.sync_version.return_value = None
+        storage.save_booking.return_value = True
+        storage.save_bookings.return_value = True
+        patches.enter_context(patch('server.store', store))
+        patches.enter_context(patch('server.storage', storage))
+        client = patches.enter_context(app.test_client())
+        return client, store, storage
+
+    with ExitStack() as patches:
+        yield make
+    server.user_cache.clear()
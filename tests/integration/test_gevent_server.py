@@ -0,0 +1,123 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import requests
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture()
+def gevent_server(request, tmp_path):
+    """
+    Fixture to start serve.py on one club and one competition written
+    in a temporary directory, writing the bookings in the requests
+    unless a flush interval is given as parameter.
+    """
+    clubs = tmp_path / 'clubs.json'
+    competitions = tmp_path / 'competitions.json'
+    clubs.write_text(json.dumps({'clubs': [
+        {'name': 'Club gevent', 'email': 'gevent@mail.fr',
+         'points': '20'}]}))
+    competitions.write_text(json.dumps({'competitions': [
+        {'name': 'Comp gevent', 'date': '2099-01-01 10:00:00',
+         'numberOfPlaces': '30'}]}))
+    env = dict(os.environ,
+               FLASK_CLUBS_FILE=str(clubs),
+               FLASK_COMPETITIONS_FILE=str(competitions),
+               FLASK_BOOKINGS_FILE=str(tmp_path / 'booking_places.json'),
+               FLASK_BOOKINGS_JOURNAL=str(tmp_path /
+                                          'booking_places.journal'),
+               FLASK_PERSIST_FLUSH_INTERVAL=getattr(request, 'param', '0'))
+    (tmp_path / 'booking_places.json').write_text(
+        json.dumps({'booking_places': []}))
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, 'serve.py', '--port', str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                process.kill()
+                raise
+            time.sleep(0.1)
+    yield url, tmp_path
+    process.terminate()
+    process.wait()
+
+
+def test_idle_connections_do_not_block(gevent_server):
+    """
+    Idle keep-alive clients don't hold up the other requests.
+    """
+    url, _ = gevent_server
+    port = int(url.rsplit(':', 1)[1])
+    idle = [socket.create_connection(('127.0.0.1', port))
+            for _ in range(200)]
+    try:
+        response = requests.get(f'{url}/clubs', timeout=5)
+        assert response.status_code == 200
+        assert 'Club gevent' in response.text
+    finally:
+        for connection in idle:
+            connection.close()
+
+
+def book(url):
+    session = requests.Session()
+    session.post(f'{url}/show_summary', data={'email': 'gevent@mail.fr'},
+                 timeout=5)
+    return session.post(f'{url}/purchase_places',
+                        data={'club': 'Club gevent',
+                              'competition': 'Comp gevent',
+                              'places': '3'}, timeout=5)
+
+
+def test_booking_written_to_journal(gevent_server):
+    url, tmp_path = gevent_server
+    assert 'Great-booking complete!' in book(url).text
+    lines = (tmp_path / 'booking_places.journal').read_text().splitlines()
+    batch = json.loads(lines[-1])
+    assert batch['bookings'][0]['places'] == 3
+    assert batch['clubs'] == {'gevent@mail.fr': 17}
+
+
+@pytest.mark.parametrize('gevent_server', ['0.5'], indirect=True)
+def test_booking_written_behind(gevent_server):
+    """
+    The bookings are written by the background flush of the server.
+    """
+    url, tmp_path = gevent_server
+    assert 'Great-booking complete!' in book(url).text
+    journal = tmp_path / 'booking_places.journal'
+    deadline = time.monotonic() + 10
+    while not (journal.exists() and journal.read_text().count('\n') > 1):
+        assert time.monotonic() < deadline, 'booking never written'
+        time.sleep(0.1)
+    batch = json.loads(journal.read_text().splitlines()[-1])
+    assert batch['clubs'] == {'gevent@mail.fr': 17}
+
+
+def test_ready(gevent_server):
+    """
+    The server only accepts requests once warmed up.
+    """
+    url, _ = gevent_server
+    response = requests.get(f'{url}/ready', timeout=5)
+    assert response.status_code == 200
+    assert response.json()['ready'] is True
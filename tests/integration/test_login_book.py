@@ -2,6 +2,8 @@ from unittest.mock import patch, MagicMock
 from contextlib import contextmanager
 from bs4 import BeautifulSoup
 from server import app
+from repository import Repository
+from models import Club, Competition
 import pytest
 
 
@@ -23,12 +25,12 @@ def patch_dt_club():
     """
     @contextmanager
     def _patch(name, points, email, name_comp, date, nb_pl):
-        clubs = [{'name': name, 'points': points, 'email': email}]
-        competitions = [{'name': name_comp,
-                         'date': date, 'numberOfPlaces': nb_pl}]
-        with patch('server.clubs', clubs), \
-             patch('server.competitions', competitions), \
-             patch('server.write_json') as mock_save_book:
+        clubs = [Club(name, email, points)]
+        competitions = [Competition(name_comp, date, nb_pl)]
+        with patch('server.store',
+                   Repository(clubs, competitions, [])), \
+             patch('server.storage') as mock_save_book:
+            mock_save_book.sync_version.return_value = None
             yield clubs, competitions, mock_save_book
     return _patch
 
@@ -88,8 +90,8 @@ def test_login_book_place(club_email, patch_dt_club, mock_current_user):
                        "2025-07-27 10:00:00",
                        "15") as (clubs, competitions, bookings):
         clb, compet = clubs[0], competitions[0]
-        purchase_dt = {'club': clb['name'],
-                       'competition': compet['name'], 'places': "2"}
+        purchase_dt = {'club': clb.name,
+                       'competition': compet.name, 'places': "2"}
         resp_pourchase = client.post('/purchase_places', data=purchase_dt)
 
     assert resp_pourchase.status_code == 200
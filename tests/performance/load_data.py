@@ -0,0 +1,58 @@
+"""
+Synthetic data set for the load tests.
+The data set only depends on its sizes and seed, so the locust workers
+build the same clubs and competitions as the server they hit.
+"""
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def build_data(clubs=1000, competitions=200, seed=1):
+    """
+    Return the clubs and competitions in the format of the JSON files,
+    with competitions spread over the past and the next two years.
+    """
+    rand = random.Random(seed)
+    today = datetime.now().replace(hour=10, minute=0, second=0,
+                                   microsecond=0)
+    return {
+        'clubs': [{'name': f'Load Club {n}',
+                   'email': f'secretary{n}@loadclub.test',
+                   'points': str(rand.randint(20, 200))}
+                  for n in range(clubs)],
+        'competitions': [{'name': f'Load Competition {n}',
+                          'date': (today + timedelta(
+                              days=rand.randint(-365, 730))).strftime(
+                              DATE_FORMAT),
+                          'numberOfPlaces': str(rand.randint(10, 500))}
+                         for n in range(competitions)],
+    }
+
+
+def write_data(directory, data):
+    """
+    Write clubs.json, competitions.json and an empty booking_places.json
+    in the directory, and return the FLASK_* settings pointing the
+    server at them.
+    """
+    paths = {
+        'FLASK_CLUBS_FILE': os.path.join(directory, 'clubs.json'),
+        'FLASK_COMPETITIONS_FILE': os.path.join(directory,
+                                                'competitions.json'),
+        'FLASK_BOOKINGS_FILE': os.path.join(directory,
+                                            'booking_places.json'),
+        'FLASK_BOOKINGS_JOURNAL': os.path.join(directory,
+                                               'booking_places.journal'),
+    }
+    documents = [('FLASK_CLUBS_FILE', {'clubs': data['clubs']}),
+                 ('FLASK_COMPETITIONS_FILE',
+                  {'competitions': data['competitions']}),
+                 ('FLASK_BOOKINGS_FILE', {'booking_places': []})]
+    for setting, document in documents:
+        with open(paths[setting], 'w') as f:
+            json.dump(document, f)
+    return paths
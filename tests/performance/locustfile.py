@@ -1,17 +1,163 @@
-from locust import HttpUser, task
+"""
+Load test of the booking portal on a synthetic data set.
 
+    locust -f tests/performance/locustfile.py
 
-class WelcomeUser(HttpUser):
-    @task
+On test start a data set of LOAD_CLUBS clubs and LOAD_COMPETITIONS
+competitions is written in a temporary directory and a server is started
+on it (LOAD_START_SERVER=0 to hit a server started by hand with --host,
+LOAD_SERVER=gevent to start serve.py instead of flask run).
+The server and its data are removed on test stop, so every run starts
+from the same data. When locust quits, the p50/p95/p99 of every endpoint
+are exported to LOAD_REPORT, labelled with LOAD_BUILD.
+"""
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from locust import HttpUser, between, events, task
+from load_data import DATE_FORMAT, build_data, write_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+CLUBS = int(os.environ.get('LOAD_CLUBS', 1000))
+COMPETITIONS = int(os.environ.get('LOAD_COMPETITIONS', 200))
+SEED = int(os.environ.get('LOAD_SEED', 1))
+START_SERVER = os.environ.get('LOAD_START_SERVER', '1') == '1'
+PORT = int(os.environ.get('LOAD_PORT', 5050))
+REPORT = os.environ.get('LOAD_REPORT', 'load_report.json')
+BUILD = os.environ.get('LOAD_BUILD', 'local')
+SERVER = os.environ.get('LOAD_SERVER', 'flask')
+
+DATA = build_data(CLUBS, COMPETITIONS, SEED)
+UPCOMING = [competition['name'] for competition in DATA['competitions']
+            if datetime.strptime(competition['date'], DATE_FORMAT) >
+            datetime.now()]
+server = None
+
+
+@events.test_start.add_listener
+def start_server(environment, **kwargs):
+    """
+    Write a fresh data set and start a server on it.
+    """
+    global server
+    if not START_SERVER or server is not None:
+        return
+    directory = tempfile.mkdtemp(prefix='gudlft-load-')
+    env = dict(os.environ, **write_data(directory, DATA))
+    if SERVER == 'gevent':
+        command = [sys.executable, 'serve.py', '--port', str(PORT)]
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'server', 'run',
+                   '--port', str(PORT), '--with-threads']
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    server = (process, directory)
+    wait_for_port(PORT)
+
+
+@events.test_stop.add_listener
+def stop_server(environment, **kwargs):
+    """
+    Stop the server and remove its data, the next run starts over.
+    """
+    global server
+    if server is None:
+        return
+    process, directory = server
+    process.terminate()
+    process.wait()
+    shutil.rmtree(directory, ignore_errors=True)
+    server = None
+
+
+@events.quitting.add_listener
+def export_percentiles(environment, **kwargs):
+    """
+    Export the response time percentiles of every endpoint.
+    """
+    endpoints = {}
+    for entry in environment.stats.entries.values():
+        endpoints[f'{entry.method} {entry.name}'] = {
+            'requests': entry.num_requests,
+            'failures': entry.num_failures,
+            'p50': entry.get_response_time_percentile(0.5),
+            'p95': entry.get_response_time_percentile(0.95),
+            'p99': entry.get_response_time_percentile(0.99),
+        }
+    with open(REPORT, 'w') as f:
+        json.dump({'build': BUILD, 'clubs': CLUBS,
+                   'competitions': COMPETITIONS, 'endpoints': endpoints},
+                  f, indent=2)
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'The server did not start on port {port}')
+
+
+class ClubSecretary(HttpUser):
+    """
+    Secretary of a random club, mostly looking at the competitions and
+    the points board, sometimes booking places.
+    """
+    host = f'http://127.0.0.1:{PORT}'
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        self.club = random.choice(DATA['clubs'])
+        self.login()
+
+    def login(self):
+        self.client.post('/show_summary', data={'email': self.club['email']},
+                         name='/show_summary')
+
+    @task(10)
     def welcome(self):
-        self.client.get('/')
-        self.client.get("/clubs")
-        self.client.post("/show_summary",
-                         data={"email": "admin@irontemple.com"})
-        self.client.get("/welcome")
-        self.client.get('/book/Spring Festival/Simply Lift')
+        self.client.get('/welcome', name='/welcome')
+
+    @task(3)
+    def browse_competitions(self):
+        self.client.get('/welcome',
+                        params={'page': random.randint(1, 5),
+                                'upcoming': '1', 'available': '1'},
+                        name='/welcome?filters')
+
+    @task(5)
+    def clubs_board(self):
+        self.client.get('/clubs', name='/clubs')
+
+    @task(3)
+    def book(self):
+        competition = random.choice(UPCOMING)
+        self.client.get(f"/book/{competition}/{self.club['name']}",
+                        name='/book/[competition]/[club]')
+
+    @task(2)
+    def purchase_places(self):
         self.client.post('/purchase_places',
-                         data={'club': 'Simply Lift',
-                               'competition': 'Fall Classic',
-                               'places': '10'})
-        self.client.get('/logout')
+                         data={'club': self.club['name'],
+                               'competition': random.choice(UPCOMING),
+                               'places': str(random.randint(1, 2))},
+                         name='/purchase_places')
+
+    @task(1)
+    def index(self):
+        self.client.get('/', name='/')
+
+    @task(1)
+    def logout_login(self):
+        self.client.get('/logout', name='/logout')
+        self.login()
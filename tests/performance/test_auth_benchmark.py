@@ -0,0 +1,69 @@
+"""
+Benchmarks of the authenticated path: the club read from the session
+token against the lookup in the user cache and the store.
+
+    pytest tests/performance/test_auth_benchmark.py
+"""
+from itertools import count
+from unittest.mock import patch
+from models import Club
+from repository import Repository
+from server import app, user_cache
+import pytest
+
+CLUBS = 10000
+
+
+@pytest.fixture(scope='module')
+def clubs():
+    return [Club(f'Club {n}', f'club{n}@mail.fr', 100) for n in range(CLUBS)]
+
+
+@pytest.fixture(params=['token', 'lookup'])
+def client(request, clubs):
+    """
+    Fixture to provide a test client logged in as the last club, with
+    the session token or the lookup of the club on every request.
+    """
+    app.config['TESTING'] = True
+    with patch('server.store', Repository(clubs, [], [])) as store, \
+         patch.dict(app.config, SESSION_TOKEN=request.param == 'token'), \
+         app.test_client() as client:
+        client.post('/show_summary', data={'email': clubs[-1].email})
+        yield client, store
+    user_cache.clear()
+
+
+def test_login_burst(benchmark, client, clubs):
+    """
+    Logins of a different club every time.
+    """
+    client, _ = client
+    numbers = count()
+
+    def login():
+        email = clubs[next(numbers) % CLUBS].email
+        return client.post('/show_summary', data={'email': email})
+
+    response = benchmark(login)
+    assert response.status_code == 302
+
+
+def test_authenticated_request(benchmark, client):
+    client, _ = client
+    response = benchmark(client.get, '/api/v1/summary')
+    assert response.status_code == 200
+
+
+def test_authenticated_request_stale_points(benchmark, client, clubs):
+    """
+    Every request follows a change of the points of another club.
+    """
+    client, store = client
+
+    def change_points():
+        store.set_points(clubs[0], clubs[0].points + 1)
+
+    response = benchmark.pedantic(client.get, args=('/api/v1/summary',),
+                                  setup=change_points, rounds=2000)
+    assert response.status_code == 200
@@ -0,0 +1,122 @@
+"""
+Benchmarks of every route on synthetic data sets of 10, 1,000 and 100,000
+clubs, competitions and bookings.
+
+Save a baseline:
+    pytest tests/performance --benchmark-autosave
+Compare with the last baseline, failing when a route is slower:
+    pytest tests/performance --benchmark-compare \
+        --benchmark-compare-fail=mean:20%
+"""
+from datetime import datetime, timedelta
+from itertools import count
+from unittest.mock import patch
+from booking_journal import BookingJournal
+from models import Club, Competition
+from repository import Repository
+from server import app
+from storage import JsonStorage
+import pytest
+
+SIZES = [10, 1000, 100000]
+POINTS = 10 ** 9
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: f'{size}')
+def dataset(request):
+    """
+    Fixture to provide size clubs, competitions and bookings.
+    """
+    size = request.param
+    first_day = datetime(2025, 1, 1, 10)
+    clubs = [Club(f'Club {n}', f'club{n}@mail.fr', POINTS)
+             for n in range(size)]
+    competitions = [Competition(f'Comp {n}', first_day + timedelta(hours=n),
+                                POINTS) for n in range(size)]
+    bookings = [{'id': str(n), 'club_id': f'club{n % size}@mail.fr',
+                 'competition_id': f'Comp {n * 7 % size}', 'places': 1}
+                for n in range(size)]
+    return clubs, competitions, bookings
+
+
+@pytest.fixture()
+def client(dataset, tmp_path):
+    """
+    Fixture to provide a test client on the data set, logged in as the
+    last club, with the bookings written behind in a temporary journal.
+    """
+    clubs, competitions, bookings = dataset
+    journal = BookingJournal(str(tmp_path / 'booking_places.json'),
+                             str(tmp_path / 'booking_places.journal'),
+                             fsync='never')
+    storage = JsonStorage(str(tmp_path / 'clubs.json'),
+                          str(tmp_path / 'competitions.json'),
+                          journal, flush_interval=60, batch_size=10 ** 6)
+    app.config['TESTING'] = True
+    with patch('server.store',
+               Repository(clubs, competitions, list(bookings))), \
+         patch('server.storage', storage), \
+         patch('server.BOOKING_LIMIT', POINTS), \
+         app.test_client() as client:
+        login(client, clubs[-1])
+        yield client, clubs[-1], competitions
+    storage.close()
+
+
+def login(client, club):
+    client.post('/show_summary', data={'email': club.email})
+
+
+def test_index(benchmark, client):
+    client, _, _ = client
+    response = benchmark(client.get, '/')
+    assert response.status_code == 200
+
+
+def test_clubs_list(benchmark, client):
+    client, _, _ = client
+    response = benchmark(client.get, '/clubs')
+    assert response.status_code == 200
+
+
+def test_show_summary(benchmark, client):
+    client, club, _ = client
+    response = benchmark(client.post, '/show_summary',
+                         data={'email': club.email})
+    assert response.status_code == 302
+
+
+def test_welcome(benchmark, client):
+    client, _, _ = client
+    response = benchmark(client.get, '/welcome')
+    assert response.status_code == 200
+
+
+def test_book(benchmark, client):
+    client, club, competitions = client
+    url = f'/book/{competitions[-1].name}/{club.name}'
+    response = benchmark(client.get, url)
+    assert response.status_code == 200
+
+
+def test_purchase_places(benchmark, client):
+    client, club, competitions = client
+    numbers = count()
+
+    def purchase():
+        competition = competitions[next(numbers) % len(competitions)]
+        return client.post('/purchase_places',
+                           data={'club': club.name,
+                                 'competition': competition.name,
+                                 'places': '1'})
+
+    response = benchmark(purchase)
+    assert 'Great-booking complete!' in response.get_data(as_text=True)
+
+
+def test_logout(benchmark, client):
+    client, club, _ = client
+    response = benchmark.pedantic(client.get, args=('/logout',),
+                                  setup=lambda: login(client, club),
+                                  rounds=200)
+    assert response.status_code == 302
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from conftest import NEXT_YEAR
+from models import Club, Competition
+import pytest
+
+
+@pytest.fixture()
+def client(make_client):
+    """
+    Fixture to provide an API client on two clubs and two competitions,
+    with a mocked storage.
+    """
+    client, _, _ = make_client(
+        [Club('Club A', 'a@mail.fr', 20), Club('Club B', 'b@mail.fr', 5)],
+        [Competition('Comp A', NEXT_YEAR, 10),
+         Competition('Comp B', NEXT_YEAR + timedelta(days=1), 3)])
+    return client
+
+
+def login(client, email='a@mail.fr'):
+    return client.post('/api/v1/login', json={'email': email})
+
+
+def test_clubs(client):
+    response = client.get('/api/v1/clubs')
+    assert response.json == {'clubs': [{'name': 'Club A', 'points': 20},
+                                       {'name': 'Club B', 'points': 5}]}
+
+
+def test_competitions_conditional_get(client):
+    response = client.get('/api/v1/competitions?per_page=1')
+    assert response.json == {
+        'competitions': [{'name': 'Comp A',
+                          'date': NEXT_YEAR.strftime('%Y-%m-%d %H:%M:%S'),
+                          'places': 10}],
+        'page': 1, 'has_next': True}
+    etag = response.headers['ETag']
+    again = client.get('/api/v1/competitions?per_page=1',
+                       headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_login_and_summary(client):
+    assert login(client, 'unknown@mail.fr').status_code == 401
+    assert client.get('/api/v1/summary').status_code == 401
+    assert login(client).json == {'name': 'Club A', 'email': 'a@mail.fr',
+                                  'points': 20}
+    assert client.get('/api/v1/summary').json['points'] == 20
+
+
+@pytest.mark.parametrize("body", [{'email': ['a@mail.fr']}, {}, ['x']])
+def test_login_malformed(client, body):
+    response = client.post('/api/v1/login', json=body)
+    assert response.status_code == 400
+    assert response.json == {'error': 'email must be a string'}
+
+
+def test_book(client):
+    login(client)
+    response = client.post('/api/v1/bookings',
+                           json={'competition': 'Comp A', 'places': 4})
+    assert response.status_code == 201
+    assert response.json == {
+        'booked': True, 'points': 16,
+        'competition': {'name': 'Comp A',
+                        'date': NEXT_YEAR.strftime('%Y-%m-%d %H:%M:%S'),
+                        'places': 6}}
+    etag = client.get('/api/v1/summary').headers['ETag']
+    client.post('/api/v1/bookings', json={'competition': 'Comp A',
+                                          'places': 1})
+    assert client.get('/api/v1/summary', headers={
+        'If-None-Match': etag}).json['points'] == 15
+
+
+@pytest.mark.parametrize("body, status, error", [
+    ({'competition': 'Comp B', 'places': 4}, 409,
+     'Sorry, not enough places available'),
+    ({'competition': 'Comp C', 'places': 1}, 400, 'unknown competition '
+     'Comp C'),
+    ({'competition': 'Comp A', 'places': -1}, 400,
+     'places must be a positive integer'),
+    ({'competition': ['Comp A'], 'places': 1}, 400,
+     'competition must be a string')])
+def test_book_refused(client, body, status, error):
+    login(client)
+    response = client.post('/api/v1/bookings', json=body)
+    assert response.status_code == status
+    assert response.json['error'] == error
+
+
+def test_bulk(client):
+    login(client)
+    response = client.post('/api/v1/bookings/bulk', json={'items': [
+        {'competition': 'Comp A', 'places': 2},
+        {'competition': 'Comp B', 'places': 3}]})
+    assert response.json['booked'] is True
+    assert response.json['points'] == 15
@@ -1,6 +1,8 @@
 from contextlib import contextmanager
 from unittest.mock import patch
 from server import value_validator, validate_booking, check_booking_limit_club
+from repository import Repository
+from models import Club, Competition
 import pytest
 
 # Messages as global variables for testing
@@ -31,8 +33,8 @@ def patch_booging_dt():
              "competition_id": 'comp1@mail.fr',
              'places': 5},
              ]
-        with patch('server.bookings', bookings):
-            yield bookings
+        with patch('server.store', Repository([], [], bookings)) as store:
+            yield store
 
     return _patch
 
@@ -51,17 +53,19 @@ def test_value_validator(value, response):
 
 
 @pytest.mark.parametrize("request_plc, points, exist_plc, message",
-                         [(10, {'points': 9}, {'numberOfPlaces': 12}, msg1),
-                          (5, {'points': 5}, {'numberOfPlaces': 4}, msg2),
-                          (13, {'points': 14}, {'numberOfPlaces': 13}, msg3),
-                          (1, {'points': 1}, {'numberOfPlaces': 0}, msg4),
-                          (1, {'points': 1}, {'numberOfPlaces': 1}, None)
+                         [(10, 9, 12, msg1),
+                          (5, 5, 4, msg2),
+                          (13, 14, 13, msg3),
+                          (1, 1, 0, msg4),
+                          (1, 1, 1, None)
                           ])
 def test_process_booking(request_plc, points, exist_plc, message):
     """
     Helper function to process booking and return the expected message.
     """
-    assert validate_booking(request_plc, points, exist_plc) == message
+    club = Club('Club', 'club@mail.fr', points)
+    competition = Competition('Comp', '2025-07-27 10:00:00', exist_plc)
+    assert validate_booking(request_plc, club, competition) == message
 
 
 @pytest.mark.parametrize("club_id, competition_id, booking_places, response",
@@ -0,0 +1,86 @@
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from booking_engine import BookingEngine
+from repository import Repository
+from models import Club, Competition
+from server import book_places, validate_booking
+import pytest
+
+
+@pytest.fixture()
+def switch_often():
+    """
+    Fixture to switch threads as often as possible, so the races show up.
+    """
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def slow_validate_booking(places_required, club, competition):
+    """
+    validate_booking releasing the GIL before returning, to widen the
+    window between the checks and the update of points and places.
+    """
+    message = validate_booking(places_required, club, competition)
+    time.sleep(0)
+    return message
+
+
+def test_same_lock_for_same_key():
+    engine = BookingEngine()
+    assert engine.lock('club', 'a@mail.fr') is engine.lock('club', 'a@mail.fr')
+    assert engine.lock('club', 'a') is not engine.lock('competition', 'a')
+
+
+def test_transaction_releases_locks():
+    engine = BookingEngine()
+    with pytest.raises(ValueError):
+        with engine.transaction('a@mail.fr', ['Comp B', 'Comp A']):
+            raise ValueError
+    assert engine.lock('club', 'a@mail.fr').acquire(blocking=False)
+    assert engine.lock('competition', 'Comp A').acquire(blocking=False)
+
+
+def test_concurrent_purchases(switch_often):
+    """
+    Fire thousands of concurrent purchases and check that no place is
+    oversold, no club spends more than its points and no club books
+    more than 12 places of a competition.
+    """
+    clubs = [Club(f'Club {n}', f'club{n}@mail.fr', 40) for n in range(20)]
+    competitions = [Competition(f'Comp {n}', '2025-07-27 10:00:00', 30)
+                    for n in range(5)]
+    store = Repository(clubs, competitions, [])
+    rand = random.Random(4)
+    purchases = [(rand.choice(clubs), rand.choice(competitions),
+                  rand.randint(1, 4)) for _ in range(4000)]
+
+    with patch('server.store', store), \
+         patch('server.validate_booking', slow_validate_booking), \
+         patch('server.engine', BookingEngine()), \
+         patch('server.storage', MagicMock()) as storage:
+        # call_count of a mock is not thread-safe, list.append is
+        saved = []
+        storage.save_booking.side_effect = \
+            lambda *args: saved.append(args) or True
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(lambda p: book_places(*p),
+                                        purchases))
+
+    assert results.count(None) == store.bookings_count
+    assert len(saved) == store.bookings_count
+    for competition in competitions:
+        sold = sum(places for (_, name), places in store.booked.items()
+                   if name == competition.name)
+        assert competition.numberOfPlaces == 30 - sold >= 0
+    for club in clubs:
+        spent = sum(places for (email, _), places in store.booked.items()
+                    if email == club.email)
+        assert club.points == 40 - spent >= 0
+        for competition in competitions:
+            assert store.booked_places(club.email, competition.name) <= 12
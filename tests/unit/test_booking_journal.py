@@ -0,0 +1,141 @@
+import json
+from booking_journal import BookingJournal
+import pytest
+
+
+def booking(number):
+    return {'id': str(number),
+            'club_id': 'john@simplylift.co',
+            'competition_id': 'Fall Classic',
+            'places': 1}
+
+
+@pytest.fixture()
+def journal_paths(tmp_path):
+    """
+    Fixture to provide a snapshot with one booking and a journal path.
+    """
+    snapshot = tmp_path / 'booking_places.json'
+    snapshot.write_text(json.dumps({'booking_places': [booking(0)]}))
+    return str(snapshot), str(tmp_path / 'booking_places.journal')
+
+
+def test_replay_snapshot_and_journal(journal_paths):
+    """
+    Bookings appended to the journal are found again after a restart.
+    """
+    journal = BookingJournal(*journal_paths, compact_every=0)
+    assert journal.load() == ({('john@simplylift.co', 'Fall Classic'): 1}, 1)
+    journal.append(booking(1))
+    journal.append(booking(2))
+    journal.close()
+
+    restarted = BookingJournal(*journal_paths, compact_every=0)
+    assert restarted.load() == ({('john@simplylift.co', 'Fall Classic'): 3}, 3)
+    assert list(restarted.records()) == [booking(0), booking(1), booking(2)]
+
+
+@pytest.mark.parametrize("fsync", ['always', 'never', 2])
+def test_fsync_policy(journal_paths, fsync):
+    journal = BookingJournal(*journal_paths, fsync=fsync, compact_every=0)
+    journal.load()
+    for number in range(1, 4):
+        journal.append(booking(number))
+    journal.close()
+    assert len(list(BookingJournal(*journal_paths).records())) == 4
+
+
+def test_compaction(journal_paths):
+    """
+    Compaction merges the journal into the snapshot and empties it.
+    """
+    snapshot_path, journal_path = journal_paths
+    journal = BookingJournal(*journal_paths, compact_every=3)
+    journal.load()
+    for number in range(1, 5):
+        journal.append(booking(number))
+    journal.close()
+
+    with open(snapshot_path) as f:
+        snapshot = json.load(f)
+    assert snapshot['booking_places'] == [booking(n) for n in range(4)]
+    with open(journal_path) as f:
+        assert len(f.readlines()) == 2
+    assert list(BookingJournal(*journal_paths).records()) == \
+        [booking(n) for n in range(5)]
+
+
+def test_merged_journal_is_skipped(journal_paths):
+    """
+    A journal left over from before the last compaction (crash before it
+    was reset) is not replayed twice.
+    """
+    snapshot_path, journal_path = journal_paths
+    journal = BookingJournal(*journal_paths, compact_every=0)
+    journal.load()
+    journal.append(booking(1))
+    journal.close()
+    with open(journal_path) as f:
+        stale_journal = f.read()
+    journal.compact()
+    with open(journal_path, 'w') as f:
+        f.write(stale_journal)
+
+    restarted = BookingJournal(*journal_paths)
+    restarted.load()
+    assert list(restarted.records()) == [booking(0), booking(1)]
+    restarted.append(booking(2))
+    assert list(BookingJournal(*journal_paths).records()) == \
+        [booking(0), booking(1), booking(2)]
+
+
+def test_partial_last_line_is_ignored(journal_paths):
+    _, journal_path = journal_paths
+    journal = BookingJournal(*journal_paths, compact_every=0)
+    journal.load()
+    journal.append(booking(1))
+    journal.close()
+    with open(journal_path, 'a') as f:
+        f.write('{"id": "2", "club')
+
+    restarted = BookingJournal(*journal_paths, compact_every=0)
+    restarted.load()
+    assert list(restarted.records()) == [booking(0), booking(1)]
+    restarted.append(booking(3))
+    assert list(BookingJournal(*journal_paths).records()) == \
+        [booking(0), booking(1), booking(3)]
+
+
+def test_booked_by_day(journal_paths):
+    """
+    The places of the dated bookings are totalled by day on replay.
+    """
+    journal = BookingJournal(*journal_paths, compact_every=0)
+    journal.load()
+    journal.append(dict(booking(1), date='2026-10-17 09:00:00'))
+    journal.append(dict(booking(2), date='2026-10-18 09:00:00'))
+    journal.append(dict(booking(3), date='2026-10-18 18:30:00', places=-1))
+    journal.close()
+
+    restarted = BookingJournal(*journal_paths, compact_every=0)
+    restarted.load()
+    assert restarted.booked_by_day == {'2026-10-17': 1, '2026-10-18': 0}
+
+
+def test_records_read_during_compaction(journal_paths):
+    """
+    The records being read are all found even when the journal is
+    compacted meanwhile.
+    """
+    journal = BookingJournal(*journal_paths, compact_every=0)
+    journal.load()
+    journal.append(booking(1))
+    journal.append(booking(2))
+    records = journal.records()
+    assert next(records) == booking(0)
+
+    journal.compact()
+    journal.append(booking(3))
+    assert list(records) == [booking(1), booking(2)]
+    assert list(journal.records()) == [booking(n) for n in range(4)]
+    journal.close()
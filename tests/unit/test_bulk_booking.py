@@ -0,0 +1,75 @@
+from conftest import NEXT_YEAR
+from models import Club, Competition
+import pytest
+
+
+@pytest.fixture()
+def client(make_client):
+    """
+    Fixture to provide a client logged in as a club with 20 points, two
+    upcoming competitions of 10 places and a mocked storage.
+    """
+    client, store, storage = make_client(
+        [Club('Club A', 'a@mail.fr', 20)],
+        [Competition('Comp A', NEXT_YEAR, 10),
+         Competition('Comp B', NEXT_YEAR, 10)],
+        [{'id': '1', 'club_id': 'a@mail.fr', 'competition_id': 'Comp B',
+          'places': 8}])
+    client.post('/show_summary', data={'email': 'a@mail.fr'})
+    return client, store, storage
+
+
+def bulk(client, *items):
+    return client.post('/purchase_places/bulk', json={'items': [
+        {'competition': competition, 'places': places}
+        for competition, places in items]})
+
+
+def test_bulk_booked_with_one_write(client):
+    client, store, storage = client
+    response = bulk(client, ('Comp A', 3), ('Comp B', 2), ('Comp A', 4))
+    assert response.status_code == 200
+    assert response.json == {
+        'booked': True, 'points': 11,
+        'items': [{'competition': 'Comp A', 'places': 3, 'error': None},
+                  {'competition': 'Comp B', 'places': 2, 'error': None},
+                  {'competition': 'Comp A', 'places': 4, 'error': None}]}
+    assert storage.save_bookings.call_count == 1
+    assert store.competition_by_name('Comp A').numberOfPlaces == 3
+    assert store.booked_places('a@mail.fr', 'Comp A') == 7
+
+
+def test_bulk_all_or_none(client):
+    """
+    An item over the club limit, counting the items before it, cancels
+    the whole bulk.
+    """
+    client, store, storage = client
+    response = bulk(client, ('Comp B', 3), ('Comp A', 3), ('Comp B', 2))
+    assert response.status_code == 409
+    assert [item['error'] for item in response.json['items']] == [
+        None, None,
+        'You can not book more than 12 places for this competition']
+    assert response.json['points'] == 20
+    assert not storage.save_bookings.called
+    assert store.competition_by_name('Comp A').numberOfPlaces == 10
+
+
+def test_bulk_points_counted_across_items(client):
+    client, _, _ = client
+    response = bulk(client, ('Comp A', 10), ('Comp B', 2), ('Comp A', 1))
+    assert [item['error'] for item in response.json['items']] == [
+        None, None, 'The competition you chose is not available anymore']
+
+
+@pytest.mark.parametrize("body", [
+    {}, {'items': []}, {'items': [{'competition': 'Comp A', 'places': 0}]},
+    {'items': [{'competition': 'Unknown', 'places': 1}]},
+    {'items': [{'competition': 'Comp A', 'places': '1'}]},
+    {'items': [{'competition': {'a': 1}, 'places': 1}]}])
+def test_bulk_malformed(client, body):
+    client, _, storage = client
+    response = client.post('/purchase_places/bulk', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.json
+    assert not storage.save_bookings.called
@@ -0,0 +1,30 @@
+from cache import LRUCache
+
+
+def test_lru_eviction():
+    """
+    The least recently used entry is evicted when the cache is full.
+    """
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_invalidate():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.invalidate('a')
+    cache.invalidate('unknown')
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache():
+    cache = LRUCache(0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
@@ -0,0 +1,53 @@
+from unittest.mock import patch
+from server import app
+from repository import Repository
+from models import Club, Competition
+import pytest
+
+
+@pytest.fixture()
+def client_and_store():
+    """
+    Fixture to patch the store with two clubs and one competition.
+    """
+    clubs = [Club('Club A', 'a@mail.fr', 10), Club('Club B', 'b@mail.fr', 4)]
+    competitions = [Competition('Comp A', '2025-07-27 10:00:00', 20)]
+    repository = Repository(clubs, competitions, [])
+    app.config['TESTING'] = True
+    with patch('server.store', repository), app.test_client() as client:
+        yield client, repository
+
+
+@pytest.mark.parametrize("url", ['/clubs', '/clubs.json'])
+def test_not_modified(client_and_store, url):
+    """
+    Polling clients get a 304 until the points of a club change.
+    """
+    client, repository = client_and_store
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert response.headers['Last-Modified']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    repository.set_points(repository.club_by_name('Club A'), 8)
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_clubs_json(client_and_store):
+    client, _ = client_and_store
+    response = client.get('/clubs.json')
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == {'clubs': [
+        {'name': 'Club A', 'points': 10}, {'name': 'Club B', 'points': 4}]}
+
+
+def test_clubs_html(client_and_store):
+    client, repository = client_and_store
+    assert '<td>10</td>' in client.get('/clubs').get_data(as_text=True)
+    repository.set_points(repository.club_by_name('Club A'), 8)
+    assert '<td>8</td>' in client.get('/clubs').get_data(as_text=True)
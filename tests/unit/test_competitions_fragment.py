@@ -0,0 +1,67 @@
+from unittest.mock import patch
+from flask import render_template
+from server import app, competitions_fragment
+from repository import Repository
+from models import Club, Competition
+import pytest
+
+
+@pytest.fixture()
+def store():
+    """
+    Fixture to patch the store with two clubs and one competition.
+    """
+    clubs = [Club('Club A', 'a@mail.fr', 10),
+             Club("Lift & Co's", 'b@mail.fr', 4)]
+    competitions = [Competition('Comp A', '2025-07-27 10:00:00', 20)]
+    repository = Repository(clubs, competitions, [])
+    with patch('server.store', repository), \
+         patch('server.render_template', wraps=render_template) as render, \
+         app.test_request_context():
+        yield repository, render
+
+
+def test_rendered_once_per_version(store):
+    """
+    The competitions are rendered once and the booking links are
+    filled in for each club.
+    """
+    repository, render = store
+    html_a = competitions_fragment('Club A', repository.competitions)
+    html_b = competitions_fragment("Lift & Co's",
+                                   repository.competitions)
+
+    assert render.call_count == 1
+    assert 'href="/book/Comp%20A/Club%20A"' in html_a
+    assert 'href="/book/Comp%20A/Lift%20&amp;%20Co&#39;s"' in html_b
+    assert html_a.replace('Club%20A', '') == \
+        html_b.replace('Lift%20&amp;%20Co&#39;s', '')
+
+
+def test_new_version_after_booking(store):
+    repository, render = store
+    html = competitions_fragment('Club A', repository.competitions)
+    assert 'Number of Places: 20' in html
+
+    club = repository.club_by_name('Club A')
+    competition = repository.competition_by_name('Comp A')
+    repository.apply_booking(club, competition,
+                             {'id': '1', 'club_id': 'a@mail.fr',
+                              'competition_id': 'Comp A', 'places': 3})
+    html = competitions_fragment('Club A', repository.competitions)
+    assert 'Number of Places: 17' in html
+    assert render.call_count == 2
+
+
+def test_sold_out_keeps_places_and_link(store):
+    """
+    A sold out competition is only marked, the live updates show its
+    places and link again when places are released.
+    """
+    repository, _ = store
+    repository.set_places(repository.competition_by_name('Comp A'), 0)
+    html = competitions_fragment('Club A', repository.competitions)
+    assert 'data-competition="Comp A" class="sold-out"' in html
+    assert 'Number of Places: 0' in html
+    assert 'href="/book/Comp%20A/Club%20A"' in html
+    assert 'There are no more places available' in html
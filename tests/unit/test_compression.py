@@ -0,0 +1,87 @@
+import gzip
+from unittest.mock import patch
+import brotli
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+from compression import CompressedPage, negotiate
+from repository import Repository
+from models import Club, Competition
+from server import app
+import pytest
+
+
+@pytest.fixture()
+def client():
+    """
+    Fixture to provide a client on 50 clubs and 50 competitions, enough
+    for pages above the compression threshold.
+    """
+    clubs = [Club(f'Club {n}', f'club{n}@mail.fr', n) for n in range(50)]
+    competitions = [Competition(f'Comp {n}', '2025-07-27 10:00:00', n)
+                    for n in range(50)]
+    app.config['TESTING'] = True
+    with patch('server.store', Repository(clubs, competitions, [])), \
+         app.test_client() as client:
+        yield client
+
+
+@pytest.mark.parametrize("header, encoding", [
+    ('', None), ('identity', None), ('gzip, deflate', 'gzip'),
+    ('gzip, deflate, br', 'br'), ('br;q=0.5, gzip', 'gzip'),
+    ('br;q=0, gzip;q=0', None), ('*', 'br')])
+def test_negotiate(header, encoding):
+    assert negotiate(parse_accept_header(header, Accept)) == encoding
+
+
+def test_compressed_page_variants():
+    page = CompressedPage(b'a' * 1000, threshold=500)
+    body, encoding, etag = page.variant('br')
+    assert brotli.decompress(body) == b'a' * 1000
+    assert (encoding, etag) == ('br', f'{page.etag}-br')
+    assert page.variant('br')[0] is body
+    assert page.variant(None) == (b'a' * 1000, None, page.etag)
+    assert CompressedPage(b'a' * 10, 500).variant('br')[1] is None
+
+
+@pytest.mark.parametrize("encoding, decompress", [
+    ('br', brotli.decompress), ('gzip', gzip.decompress)])
+def test_clubs_board_precompressed(client, encoding, decompress):
+    identity = client.get('/clubs')
+    response = client.get('/clubs', headers={'Accept-Encoding': encoding})
+    assert response.headers['Content-Encoding'] == encoding
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert decompress(response.data) == identity.data
+    assert len(response.data) < len(identity.data)
+
+    etag = response.headers['ETag']
+    assert etag != identity.headers['ETag']
+    again = client.get('/clubs', headers={'Accept-Encoding': encoding,
+                                          'If-None-Match': etag})
+    assert again.status_code == 304
+
+
+def test_dynamic_response_compressed(client):
+    response = client.get('/api/v1/competitions?per_page=50',
+                          headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'Comp 49' in gzip.decompress(response.data)
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    again = client.get('/api/v1/competitions?per_page=50',
+                       headers={'Accept-Encoding': 'gzip',
+                                'If-None-Match': etag})
+    assert again.status_code == 304
+
+
+def test_small_response_not_compressed(client):
+    response = client.get('/api/v1/competitions?per_page=1',
+                          headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_index_cached_unless_flashed(client):
+    response = client.get('/', headers={'Accept-Encoding': 'br'})
+    assert b'GUDLFT' in brotli.decompress(response.data)
+    client.post('/show_summary', data={'email': 'unknown@mail.fr'})
+    response = client.get('/')
+    assert 'Email not found' in response.get_data(as_text=True)
@@ -0,0 +1,64 @@
+import json
+import tempfile
+from support_booking import JsonArrayReader, replace_json_array, write_json
+import pytest
+
+
+dt1 = {
+                "id": "d3ddadf9-5ca0-411f-95b6-56e2e2662772",
+                "club_id": "john@simplylift.co",
+                "competition_id": "Fall Classic",
+                "places": 2
+            }
+dt2 = {
+                "id": "a1f4b2c3-7d8e-4f91-9a2b-3c5d6e7f8a90",
+                "club_id": "john@simplylift.co",
+                "competition_id": "Fall Classic",
+                "places": 2
+            }
+
+
+def create_temp_file():
+    """Create a temporary file and return its path."""
+    with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
+        return tmp_file.name
+
+
+@pytest.mark.parametrize("given_data", [(dt1), (dt2)])
+def test_write_json(given_data,):
+    """
+    Testing the write_json support function
+    """
+    mock_path = create_temp_file()
+    write_json(mock_path, given_data)
+
+    with open(mock_path, "r") as f:
+        data = json.load(f)
+
+    assert "booking_places" in data
+    saved_data = data["booking_places"]
+    assert saved_data == given_data
+
+
+@pytest.mark.parametrize("indent, chunk_size", [(None, 1), (2, 7), (2, 4096)])
+def test_json_array_reader(tmp_path, indent, chunk_size):
+    """
+    The items are read by chunks of any size, the other members are
+    kept in fields.
+    """
+    path = tmp_path / 'booking_places.json'
+    bookings = [dict(dt1, id=str(n), places=n * 1000) for n in range(50)]
+    path.write_text(json.dumps({'booking_places': bookings,
+                                'journal_generation': 12}, indent=indent))
+    reader = JsonArrayReader(str(path), 'booking_places', chunk_size)
+    assert list(reader) == bookings
+    assert reader.fields == {'journal_generation': 12}
+
+
+def test_replace_json_array(tmp_path):
+    path = str(tmp_path / 'booking_places.json')
+    replace_json_array(path, {'journal_generation': 3}, 'booking_places',
+                       iter([dt1, dt2]))
+    with open(path) as f:
+        assert json.load(f) == {'journal_generation': 3,
+                                'booking_places': [dt1, dt2]}
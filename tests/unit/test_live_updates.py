@@ -0,0 +1,137 @@
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta
+from live_updates import Broadcaster
+from repository import Repository
+from models import Club, Competition
+import server
+from server import app
+import pytest
+
+
+def events(subscriber):
+    found = []
+    while not subscriber.empty():
+        found.append(subscriber.get()[1])
+    return found
+
+
+def test_publish_to_subscribers():
+    live = Broadcaster()
+    first, second = live.subscribe(), live.subscribe()
+    live.publish('places', {'competition': 'Comp A', 'places': 3})
+    expected = ['id: 1\nevent: places\n'
+                'data: {"competition":"Comp A","places":3}\n\n']
+    assert events(first) == expected
+    assert events(second) == expected
+    live.unsubscribe(first)
+    live.publish('places', {'competition': 'Comp A', 'places': 2})
+    assert events(first) == []
+    assert len(live) == 1
+
+
+def test_missed_events_replayed():
+    live = Broadcaster(history=3)
+    for places in range(5):
+        live.publish('places', {'places': places})
+    assert [text.split('\n')[0] for text in events(live.subscribe(3))] == [
+        'id: 4', 'id: 5']
+    assert events(live.subscribe(5)) == []
+
+
+@pytest.mark.parametrize("last_id", [1, 9])
+def test_reset_when_events_lost(last_id):
+    """
+    A client too far behind, or coming from a restarted server, reloads.
+    """
+    live = Broadcaster(history=3)
+    for places in range(5):
+        live.publish('places', {'places': places})
+    assert events(live.subscribe(last_id)) == ['event: reset\ndata: {}\n\n']
+
+
+def test_stream_heartbeat():
+    live = Broadcaster(heartbeat=0.01)
+    stream = live.stream()
+    assert next(stream) == 'retry: 3000\n\n'
+    assert next(stream) == ': keep-alive\n\n'
+    assert len(live) == 1
+    stream.close()
+    assert len(live) == 0
+
+
+def test_booking_pushed_to_event_stream():
+    clubs = [Club('Club A', 'a@mail.fr', 20)]
+    competitions = [Competition('Comp A', datetime.now() + timedelta(days=9),
+                                10)]
+    storage = MagicMock()
+    storage.sync_version.return_value = None
+    storage.save_booking.return_value = True
+    app.config['TESTING'] = True
+    with patch('server.store', Repository(clubs, competitions, [])), \
+         patch('server.storage', storage), \
+         patch('server.live', Broadcaster()), \
+         app.test_client() as client:
+        client.post('/show_summary', data={'email': 'a@mail.fr'})
+        client.post('/purchase_places', data={
+            'club': 'Club A', 'competition': 'Comp A', 'places': '3'})
+        response = client.get('/events', headers={'Last-Event-ID': '0'})
+        assert response.mimetype == 'text/event-stream'
+        stream = iter(response.response)
+        assert next(stream) == b'retry: 3000\n\n'
+        assert next(stream) == (b'id: 1\nevent: points\n'
+                                b'data: {"club":"Club A","points":17}\n\n')
+        assert next(stream) == (b'id: 2\nevent: places\n'
+                                b'data: {"competition":"Comp A","places":7}'
+                                b'\n\n')
+        response.close()
+
+
+def test_bulk_booking_published_once():
+    """
+    A bulk booking pushes the points once and the places of each of its
+    competitions once.
+    """
+    clubs = [Club('Club A', 'a@mail.fr', 20)]
+    competitions = [Competition(f'Comp {n}', datetime.now() +
+                                timedelta(days=9), 10) for n in 'AB']
+    storage = MagicMock()
+    storage.sync_version.return_value = None
+    storage.save_bookings.return_value = True
+    app.config['TESTING'] = True
+    with patch('server.store', Repository(clubs, competitions, [])), \
+         patch('server.storage', storage), \
+         patch('server.live', Broadcaster()) as live, \
+         app.test_client() as client:
+        client.post('/show_summary', data={'email': 'a@mail.fr'})
+        response = client.post('/purchase_places/bulk', json={'items': [
+            {'competition': 'Comp A', 'places': 2},
+            {'competition': 'Comp B', 'places': 1},
+            {'competition': 'Comp A', 'places': 1}]})
+        assert response.status_code == 200
+        assert live.last_id == 3
+
+
+def test_welcome_resumes_before_its_reads():
+    """
+    An event published while the welcome page reads the competitions is
+    replayed to the page, not skipped.
+    """
+    clubs = [Club('Club A', 'a@mail.fr', 20)]
+    competitions = [Competition('Comp A', datetime.now() + timedelta(days=9),
+                                10)]
+    store = Repository(clubs, competitions, [])
+    list_competitions = store.list_competitions
+
+    def published_meanwhile(**filters):
+        server.live.publish('places', {'competition': 'Comp A',
+                                       'places': 9})
+        return list_competitions(**filters)
+
+    app.config['TESTING'] = True
+    with patch('server.store', store), \
+         patch('server.live', Broadcaster()), \
+         patch.object(store, 'list_competitions', published_meanwhile), \
+         app.test_client() as client:
+        client.post('/show_summary', data={'email': 'a@mail.fr'})
+        page = client.get('/welcome').get_data(as_text=True)
+    assert 'var lastId = 0;' in page
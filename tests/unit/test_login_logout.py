@@ -1,6 +1,10 @@
 from unittest.mock import patch, MagicMock
 from contextlib import contextmanager
-from server import app
+from flask import session
+import server
+from server import app, load_user, user_cache, SESSION_CLUB
+from repository import Repository
+from models import Club, Competition
 import pytest
 
 
@@ -22,11 +26,10 @@ def patch_dt_club():
     """
     @contextmanager
     def _patch(name, points, email, name_comp, date, nb_pl):
-        clubs = [{'name': name, 'points': points, 'email': email}]
-        competitions = [{'name': name_comp,
-                         'date': date, 'numberOfPlaces': nb_pl}]
-        with patch('server.clubs', clubs), \
-             patch('server.competitions', competitions):
+        clubs = [Club(name, email, points)]
+        competitions = [Competition(name_comp, date, nb_pl)]
+        with patch('server.store',
+                   Repository(clubs, competitions, [])):
             yield clubs, competitions
     return _patch
 
@@ -75,9 +78,9 @@ def patch_session():
 @pytest.mark.parametrize("name, points, email,\
                           redirect_url, name_comp, date, nb_pl",
                          [("Club A", "30", "wrong_user@example.com", "/",
-                           "Comp1", "date1", 3),
+                           "Comp1", "2020-03-27 10:00:00", 3),
                           ("Club B", "15", "user@example.com", "/welcome",
-                           "comp2", "date2", 2)
+                           "comp2", "2020-10-22 13:30:00", 2)
                           ])
 def test_club_login(patch_dt_club, club_email, name, points, email,
                     redirect_url, name_comp, date, nb_pl):
@@ -115,3 +118,79 @@ def test_logout(patch_session):
     assert response.status_code == 200
     assert 'Welcome to the GUDLFT Registration Portal!' \
         in response.get_data(as_text=True)
+
+
+def test_load_user(patch_dt_club):
+    """
+    Test load_user reads the club from the store and is refreshed
+    once the club is invalidated in the user cache.
+    """
+    with patch_dt_club("Club A", "30", "user@example.com",
+                       "Comp1", "2020-03-27 10:00:00", 3) as (clubs, _), \
+            app.test_request_context():
+        user = load_user('user@example.com')
+        assert (user.name, user.points) == ("Club A", 30)
+        assert load_user('user@example.com') is user
+
+        clubs[0].points = 25
+        user_cache.invalidate('user@example.com')
+        assert load_user('user@example.com').points == 25
+        assert load_user('unknown@example.com') is None
+    user_cache.clear()
+
+
+def test_load_user_from_session_token(patch_dt_club):
+    """
+    The club is read from the session token until its own points
+    change, then looked up again and the token renewed.
+    """
+    with patch_dt_club("Club A", "30", "user@example.com",
+                       "Comp1", "2020-03-27 10:00:00", 3) as (clubs, _), \
+            patch.dict(app.config, SESSION_TOKEN=True), \
+            app.test_request_context():
+        assert load_user('user@example.com').points == 30
+        token = session[SESSION_CLUB]
+        assert token[:3] == ['user@example.com', 'Club A', 30]
+
+        with patch('server.store.club_by_email') as club_by_email:
+            assert load_user('user@example.com').points == 30
+            assert not club_by_email.called
+
+        # The points of another club changed
+        server.store.set_points(Club('Club B', 'b@example.com', 10), 5,
+                                'booking-1')
+        with patch('server.store.club_by_email') as club_by_email:
+            assert load_user('user@example.com').points == 30
+            assert not club_by_email.called
+
+        user_cache.clear()
+        server.store.set_points(clubs[0], 25, 'booking-2')
+        assert load_user('user@example.com').points == 25
+        assert session[SESSION_CLUB][2:] == [25, 'booking-2']
+    user_cache.clear()
+
+
+@pytest.mark.parametrize("query, listed, next_page",
+                         [("", ["Comp 1", "Comp 2"], True),
+                          ("?page=2", ["Comp 3"], False),
+                          ("?available=1", ["Comp 2", "Comp 3"], False),
+                          ("?upcoming=1", ["Comp 3"], False),
+                          ("?from=2020-01-01&to=2020-12-31", ["Comp 1"],
+                           False),
+                          ("?page=abc&from=never", ["Comp 1", "Comp 2"],
+                           True)])
+def test_welcome_pages(mock_current_user, query, listed, next_page):
+    """
+    Test the pagination and the filters of the competitions.
+    """
+    _, client, _ = mock_current_user
+    competitions = [Competition('Comp 3', '2999-01-01 10:00:00', '5'),
+                    Competition('Comp 1', '2020-03-27 10:00:00', '0'),
+                    Competition('Comp 2', '2021-03-27 10:00:00', '5')]
+    with patch('server.store', Repository([], competitions, [])), \
+         patch('server.COMPETITIONS_PER_PAGE', 2):
+        page = client.get('/welcome' + query).get_data(as_text=True)
+
+    for name in ["Comp 1", "Comp 2", "Comp 3"]:
+        assert (name in page) is (name in listed)
+    assert ('Next page' in page) is next_page
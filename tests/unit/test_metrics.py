@@ -0,0 +1,63 @@
+from flask import Flask, render_template_string
+from metrics import Histogram, Metrics, NO_TIMER
+import pytest
+
+
+@pytest.fixture()
+def client_and_metrics():
+    """
+    Fixture to provide a Flask app instrumented by enabled metrics.
+    """
+    app = Flask(__name__)
+    metrics = Metrics(enabled=True)
+    metrics.init_app(app)
+
+    @app.route('/hello')
+    def hello():
+        with metrics.timer('storage_save'):
+            pass
+        return render_template_string('Hello {{ name }}', name='club')
+
+    with app.test_client() as client:
+        yield client, metrics
+
+
+def test_histogram_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(4.25)
+
+
+def test_disabled_metrics():
+    """
+    Disabled metrics register nothing and time nothing.
+    """
+    app = Flask(__name__)
+    metrics = Metrics(enabled=False)
+    metrics.init_app(app)
+    assert metrics.timer('render') is NO_TIMER
+    assert app.test_client().get('/metrics').status_code == 404
+    assert metrics.render() == '\n'
+
+
+def test_metrics_endpoint(client_and_metrics):
+    client, _ = client_and_metrics
+    client.get('/hello')
+    client.get('/hello')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE gudlft_request_duration_seconds histogram' in text
+    assert 'gudlft_request_duration_seconds_count' \
+        '{route="hello",method="GET",status="200"} 2' in text
+    assert 'gudlft_request_duration_seconds_bucket' \
+        '{route="hello",method="GET",status="200",le="+Inf"} 2' in text
+    assert 'gudlft_stage_duration_seconds_count' \
+        '{stage="storage_save"} 2' in text
+    assert 'gudlft_stage_duration_seconds_count' \
+        '{stage="render",template="None"} 2' in text
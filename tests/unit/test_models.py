@@ -0,0 +1,33 @@
+from datetime import datetime
+from models import Club, Competition
+import pytest
+
+
+def test_club_json():
+    """
+    The club is typed at load time and saved back in the same format.
+    """
+    data = {'name': 'Simply Lift', 'email': 'john@simplylift.co',
+            'points': '13'}
+    club = Club.from_json(data)
+    assert club.points == 13
+    assert club.to_json() == data
+    assert not hasattr(club, '__dict__')
+
+
+def test_competition_json():
+    data = {'name': 'Fall Classic', 'date': '2020-10-22 13:30:00',
+            'numberOfPlaces': '13'}
+    competition = Competition.from_json(data)
+    assert competition.date == datetime(2020, 10, 22, 13, 30)
+    assert competition.numberOfPlaces == 13
+    assert competition.to_json() == data
+    assert not hasattr(competition, '__dict__')
+
+
+@pytest.mark.parametrize("data", [
+    {'name': 'Comp', 'date': '22/10/2020', 'numberOfPlaces': '13'},
+    {'name': 'Comp', 'date': '2020-10-22 13:30:00', 'numberOfPlaces': 'x'}])
+def test_invalid_competition(data):
+    with pytest.raises(ValueError):
+        Competition.from_json(data)
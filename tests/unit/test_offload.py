@@ -0,0 +1,36 @@
+import threading
+from gevent.threadpool import ThreadPool
+import offload
+import pytest
+
+
+@pytest.fixture()
+def pool():
+    """
+    Fixture to provide a gevent thread pool used by run_blocking.
+    """
+    pool = ThreadPool(2)
+    offload.use_pool(pool)
+    yield pool
+    offload.use_pool(None)
+    pool.kill()
+
+
+def current_thread(*args):
+    return threading.get_ident(), args
+
+
+def test_run_inline():
+    assert offload.run_blocking(current_thread, 1, 2) == \
+        (threading.get_ident(), (1, 2))
+
+
+def test_run_in_pool(pool):
+    thread, args = offload.run_blocking(current_thread, 1, 2)
+    assert thread != threading.get_ident()
+    assert args == (1, 2)
+
+
+def test_exception_raised_in_caller(pool):
+    with pytest.raises(ZeroDivisionError):
+        offload.run_blocking(lambda: 1 / 0)
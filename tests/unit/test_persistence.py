@@ -0,0 +1,150 @@
+import json
+import time
+from unittest.mock import MagicMock
+from booking_journal import BookingJournal
+from persistence import WriteBehind
+from storage import JsonStorage
+import pytest
+
+
+def booking(number, places):
+    return {'id': str(number), 'club_id': 'a@mail.fr',
+            'competition_id': 'Comp A', 'places': places}
+
+
+@pytest.fixture()
+def data_dir(tmp_path):
+    """
+    Fixture to provide clubs.json and competitions.json files
+    and the paths of the bookings.
+    """
+    (tmp_path / 'clubs.json').write_text(json.dumps({'clubs': [
+        {'name': 'Club A', 'email': 'a@mail.fr', 'points': '13'},
+        {'name': 'Club B', 'email': 'b@mail.fr', 'points': '4'}]}))
+    (tmp_path / 'competitions.json').write_text(json.dumps({
+        'competitions': [{'name': 'Comp A', 'date': '2025-07-27 10:00:00',
+                          'numberOfPlaces': '25'}]}))
+    return tmp_path
+
+
+def json_storage(data_dir, compact_every=0):
+    journal = BookingJournal(str(data_dir / 'booking_places.json'),
+                             str(data_dir / 'booking_places.journal'),
+                             compact_every=compact_every)
+    return JsonStorage(str(data_dir / 'clubs.json'),
+                       str(data_dir / 'competitions.json'),
+                       journal, flush_interval=60, batch_size=100)
+
+
+def test_write_behind_batches():
+    """
+    Buffered bookings are written as one batch with the last values.
+    """
+    journal = MagicMock()
+    writer = WriteBehind(journal, flush_interval=60, batch_size=100)
+    writer.add(booking(1, 2), {'a@mail.fr': 11}, {'Comp A': 23})
+    writer.add(booking(2, 3), {'a@mail.fr': 8}, {'Comp A': 20})
+    assert len(writer) == 2
+    journal.append_batch.assert_not_called()
+
+    writer.close()
+    journal.append_batch.assert_called_once_with(
+        [booking(1, 2), booking(2, 3)], {'a@mail.fr': 8}, {'Comp A': 20})
+
+
+def test_write_behind_full_batch():
+    journal = MagicMock()
+    writer = WriteBehind(journal, flush_interval=60, batch_size=2)
+    writer.add(booking(1, 2), {'a@mail.fr': 11}, {'Comp A': 23})
+    writer.add(booking(2, 3), {'a@mail.fr': 8}, {'Comp A': 20})
+    deadline = time.monotonic() + 5
+    while not journal.append_batch.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.close()
+    assert len(writer) == 0
+    journal.append_batch.assert_called_once()
+
+
+def test_write_behind_retries_failed_batch():
+    """
+    A batch the journal failed to write is kept, and written by the next
+    flush of the background thread with the bookings added since.
+    """
+    journal = MagicMock()
+    journal.append_batch.side_effect = [OSError('No space left'), None]
+    writer = WriteBehind(journal, flush_interval=60, batch_size=1)
+
+    def wait(condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    writer.add(booking(1, 2), {'a@mail.fr': 11}, {'Comp A': 23})
+    # Put back in the buffer once the write failed
+    assert wait(lambda: journal.append_batch.called and len(writer) == 1)
+    writer.add(booking(2, 3), {'a@mail.fr': 8}, {'Comp A': 20})
+    assert wait(lambda: journal.append_batch.call_count == 2)
+    assert len(writer) == 0
+    journal.append_batch.assert_called_with(
+        [booking(1, 2), booking(2, 3)], {'a@mail.fr': 8}, {'Comp A': 20})
+    writer.close()
+
+
+def test_synchronous_write():
+    journal = MagicMock()
+    writer = WriteBehind(journal, flush_interval=0)
+    writer.add(booking(1, 2), {'a@mail.fr': 11}, {'Comp A': 23})
+    journal.append_batch.assert_called_once()
+    assert writer._thread is None
+
+
+def test_restart_keeps_points_and_places(data_dir):
+    """
+    Club points and competition places are found again after a restart.
+    """
+    storage = json_storage(data_dir)
+    clubs = storage.load_clubs()
+    competitions = storage.load_competitions()
+    assert storage.load_booked() == ({}, 0)
+    storage.save_booking(clubs[0], competitions[0], booking(1, 2))
+    storage.close()
+
+    restarted = json_storage(data_dir)
+    assert [c.points for c in restarted.load_clubs()] == [11, 4]
+    assert restarted.load_competitions()[0].numberOfPlaces == 23
+    assert restarted.load_booked() == ({('a@mail.fr', 'Comp A'): 2}, 1)
+    assert list(restarted.iter_bookings()) == [booking(1, 2)]
+
+
+def test_bulk_written_in_one_batch(data_dir):
+    storage = json_storage(data_dir)
+    clubs = storage.load_clubs()
+    competition = storage.load_competitions()[0]
+    storage.load_booked()
+    storage.save_bookings(clubs[0], [(competition, booking(1, 2)),
+                                     (competition, booking(2, 3))])
+    storage.close()
+
+    lines = (data_dir / 'booking_places.journal').read_text().splitlines()
+    assert json.loads(lines[-1]) == {
+        'bookings': [booking(1, 2), booking(2, 3)],
+        'clubs': {'a@mail.fr': 8}, 'competitions': {'Comp A': 20}}
+
+
+def test_compaction_saves_clubs_and_competitions(data_dir):
+    storage = json_storage(data_dir, compact_every=1)
+    clubs = storage.load_clubs()
+    competitions = storage.load_competitions()
+    storage.load_booked()
+    storage.save_booking(clubs[0], competitions[0], booking(1, 2))
+    storage.close()
+
+    clubs_json = json.loads((data_dir / 'clubs.json').read_text())
+    assert [c['points'] for c in clubs_json['clubs']] == ['11', '4']
+    competitions_json = json.loads(
+        (data_dir / 'competitions.json').read_text())
+    assert competitions_json['competitions'][0]['numberOfPlaces'] == '23'
+    restarted = json_storage(data_dir)
+    assert restarted.load_clubs()[0].points == 11
+    assert list(restarted.iter_bookings()) == [booking(1, 2)]
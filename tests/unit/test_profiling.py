@@ -0,0 +1,53 @@
+import os
+import pstats
+from flask import Flask
+from profiling import RequestProfiler
+import pytest
+
+
+@pytest.fixture()
+def client_and_dir(tmp_path):
+    """
+    Fixture to provide a Flask app profiled with the token "secret".
+    """
+    app = Flask(__name__)
+
+    @app.route('/hello')
+    def hello():
+        return 'Hello club'
+
+    app.wsgi_app = RequestProfiler(app.wsgi_app, 'secret', str(tmp_path))
+    with app.test_client() as client:
+        yield client, tmp_path
+
+
+@pytest.mark.parametrize("headers", [{}, {'X-Profile': 'wrong'}])
+def test_not_profiled(client_and_dir, headers):
+    client, directory = client_and_dir
+    response = client.get('/hello', headers=headers)
+    assert response.get_data(as_text=True) == 'Hello club'
+    assert 'X-Profile-File' not in response.headers
+    assert os.listdir(directory) == []
+
+
+def test_profile_saved(client_and_dir):
+    """
+    The response is unchanged and the profile is saved on disk.
+    """
+    client, directory = client_and_dir
+    response = client.get('/hello', headers={'X-Profile': 'secret'})
+    assert response.get_data(as_text=True) == 'Hello club'
+    filename = response.headers['X-Profile-File']
+    assert os.listdir(directory) == [filename]
+    stats = pstats.Stats(str(directory / filename))
+    assert any(function == 'hello' for _, _, function in stats.stats)
+
+
+def test_profile_summary(client_and_dir):
+    client, _ = client_and_dir
+    response = client.get('/hello', headers={'X-Profile': 'secret',
+                                             'X-Profile-Summary': '1'})
+    summary = response.get_data(as_text=True)
+    assert response.mimetype == 'text/plain'
+    assert 'Ordered by: cumulative time' in summary
+    assert 'function calls' in summary
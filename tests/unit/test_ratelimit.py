@@ -0,0 +1,144 @@
+from flask import Flask, request
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+from ratelimit import AdmissionControl, RateLimiter, SQLiteTokenBuckets
+from ratelimit import TokenBuckets, take_token
+from server import RATE_LIMITED_ENDPOINTS, app, request_club_email
+import pytest
+
+
+@pytest.mark.parametrize("tokens, stamp, now, left, wait", [
+    (3, 0, 0, 2, 0),
+    (0, 0, 1, 1, 0),
+    (0, 0, 100, 4, 0),
+    (0.5, 0, 0, 0.5, 0.25)])
+def test_take_token(tokens, stamp, now, left, wait):
+    """
+    Test the bucket is refilled at 2 tokens per second up to 5.
+    """
+    assert take_token(tokens, stamp, now, rate=2, burst=5) == (left, wait)
+
+
+def test_token_buckets():
+    buckets = TokenBuckets(rate=0.01, burst=2)
+    assert [buckets.take('a') for _ in range(2)] == [0, 0]
+    assert buckets.take('a') > 0
+    assert buckets.take('b') == 0
+
+
+def test_sqlite_token_buckets_are_shared(tmp_path):
+    """
+    Test two workers on the same database take from the same buckets.
+    """
+    path = str(tmp_path / 'ratelimit.db')
+    first = SQLiteTokenBuckets(path, rate=0.01, burst=2)
+    second = SQLiteTokenBuckets(path, rate=0.01, burst=2)
+    assert first.take('a') == 0
+    assert second.take('a') == 0
+    assert first.take('a') > 0
+    assert second.take('b') == 0
+
+
+@pytest.fixture()
+def limited_client():
+    """
+    Fixture to provide a client on an app limiting the /book route to 2
+    requests by IP and by club, the club read from the form.
+    """
+    limited = Flask(__name__)
+    limited.add_url_rule('/book', 'book', lambda: 'booked',
+                         methods=['POST'])
+    limited.add_url_rule('/other', 'other', lambda: 'other')
+    limiter = RateLimiter(TokenBuckets(rate=0.01, burst=2), ['book'],
+                          lambda: request.form.get('email'))
+    limiter.init_app(limited)
+    return limited.test_client()
+
+
+def test_rate_limiter(limited_client):
+    for _ in range(2):
+        assert limited_client.post(
+            '/book', data={'email': 'a@mail.fr'}).status_code == 200
+    response = limited_client.post('/book', data={'email': 'a@mail.fr'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert limited_client.get('/other').status_code == 200
+
+
+def test_rate_limiter_by_club(limited_client):
+    """
+    Test a club is limited from any IP.
+    """
+    for address in ('10.0.0.1', '10.0.0.2'):
+        response = limited_client.post(
+            '/book', data={'email': 'a@mail.fr'},
+            environ_base={'REMOTE_ADDR': address})
+        assert response.status_code == 200
+    response = limited_client.post('/book', data={'email': 'a@mail.fr'},
+                                   environ_base={'REMOTE_ADDR': '10.0.0.3'})
+    assert response.status_code == 429
+    response = limited_client.post('/book', data={'email': 'b@mail.fr'},
+                                   environ_base={'REMOTE_ADDR': '10.0.0.3'})
+    assert response.status_code == 200
+
+
+def test_admission_control():
+    """
+    Test a request over the limit of requests running at once gets a
+    429, and the slot is free again once the response is returned.
+    """
+    statuses = []
+
+    def application(environ, start_response):
+        if not statuses:
+            statuses.append(Client(control).get('/').status_code)
+        return Response('ok')(environ, start_response)
+
+    control = AdmissionControl(application, limit=1)
+    assert Client(control).get('/').status_code == 200
+    assert statuses == [429]
+    assert Client(control).get('/').status_code == 200
+
+
+@pytest.mark.parametrize("kwargs", [
+    {'data': {'email': 'a@mail.fr'}},
+    {'json': {'email': 'b@mail.fr'}},
+    {}])
+def test_request_club_email_not_logged_in(kwargs):
+    """
+    Test the email sent by a club logging in is not used to limit it.
+    """
+    with app.test_request_context('/show_summary', method='POST', **kwargs):
+        assert request_club_email() is None
+
+
+@pytest.fixture()
+def limited_app():
+    """
+    Fixture to provide the app limited to 2 requests by IP and by club.
+    """
+    limiter = RateLimiter(TokenBuckets(rate=0.01, burst=2),
+                          RATE_LIMITED_ENDPOINTS, request_club_email)
+    hooks = app.before_request_funcs.setdefault(None, [])
+    hooks.insert(0, limiter.check)
+    app.config['TESTING'] = True
+    yield app
+    hooks.remove(limiter.check)
+
+
+def test_login_flood_spares_the_club(limited_app):
+    """
+    Test logging in with the email of a club from one IP until the limit
+    doesn't block the club logging in from its own IP.
+    """
+    client = limited_app.test_client()
+    statuses = [client.post('/show_summary',
+                            data={'email': 'john@simplylift.co'},
+                            environ_base={'REMOTE_ADDR': '10.0.0.1'}
+                            ).status_code for _ in range(3)]
+    assert statuses == [302, 302, 429]
+    response = limited_app.test_client().post(
+        '/show_summary', data={'email': 'john@simplylift.co'},
+        environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert response.status_code == 302
+    assert response.location.endswith('/welcome')
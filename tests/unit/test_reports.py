@@ -0,0 +1,88 @@
+import csv
+import io
+from datetime import datetime
+from conftest import NEXT_YEAR
+import server
+from server import csv_chunks
+from models import Club, Competition
+import pytest
+
+
+def record(number, places=1, date=None):
+    booking = {'id': str(number), 'club_id': 'a@mail.fr',
+               'competition_id': 'Comp A', 'places': places}
+    if date:
+        booking['date'] = date
+    return booking
+
+
+@pytest.fixture()
+def client(make_client):
+    """
+    Fixture to provide a logged in API client on two clubs and two
+    competitions, Club A having booked 4 places of Comp A before.
+    """
+    client, _, _ = make_client(
+        [Club('Club A', 'a@mail.fr', 16), Club('Club B', 'b@mail.fr', 5)],
+        [Competition('Comp A', NEXT_YEAR, 6),
+         Competition('Comp B', NEXT_YEAR, 3)],
+        [record(1, 2, '2026-10-17 09:00:00'),
+         record(2, 2, '2026-10-17 10:00:00')])
+    client.post('/api/v1/login', json={'email': 'b@mail.fr'})
+    return client
+
+
+def test_reports_follow_the_bookings(client):
+    client.post('/api/v1/bookings', json={'competition': 'Comp B',
+                                          'places': 2})
+    date = NEXT_YEAR.strftime('%Y-%m-%d %H:%M:%S')
+    assert client.get('/api/v1/reports/competitions').json == {
+        'competitions': [
+            {'name': 'Comp A', 'date': date, 'places_sold': 4,
+             'places_left': 6},
+            {'name': 'Comp B', 'date': date, 'places_sold': 2,
+             'places_left': 1}]}
+    assert client.get('/api/v1/reports/clubs').json == {'clubs': [
+        {'name': 'Club A', 'points_spent': 4, 'points': 16},
+        {'name': 'Club B', 'points_spent': 2, 'points': 3}]}
+    today = datetime.now().strftime('%Y-%m-%d')
+    assert client.get('/api/v1/reports/days').json == {'days': [
+        {'day': '2026-10-17', 'places': 4}, {'day': today, 'places': 2}]}
+
+
+@pytest.mark.parametrize("url", ['/api/v1/reports/competitions',
+                                 '/api/v1/reports/clubs',
+                                 '/api/v1/reports/days',
+                                 '/api/v1/reports/bookings.csv'])
+def test_reports_login_required(client, url):
+    client.get('/logout')
+    assert client.get(url).status_code == 401
+
+
+def test_export_bookings(client):
+    bookings = [record(1, 3, '2026-10-17 09:00:00'), record(2, -1)]
+    server.storage.iter_bookings.return_value = iter(bookings)
+    response = client.get('/api/v1/reports/bookings.csv')
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == \
+        'attachment; filename=bookings.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert rows == [
+        {'id': '1', 'date': '2026-10-17 09:00:00', 'club_id': 'a@mail.fr',
+         'competition_id': 'Comp A', 'places': '3'},
+        {'id': '2', 'date': '', 'club_id': 'a@mail.fr',
+         'competition_id': 'Comp A', 'places': '-1'}]
+
+
+@pytest.mark.parametrize("count, chunks", [(0, 1), (3, 2), (4, 2), (5, 3)])
+def test_csv_chunks(count, chunks):
+    """
+    Test the rows are read and written size at a time, the header with
+    the first ones.
+    """
+    bookings = iter([record(number) for number in range(count)])
+    found = list(csv_chunks(bookings, size=2))
+    assert len(found) == chunks
+    assert found[0].startswith('id,date,club_id,competition_id,places')
+    assert sum(chunk.count('\n') for chunk in found) == count + 1
@@ -0,0 +1,111 @@
+from datetime import datetime
+from repository import Repository
+from models import Club, Competition
+import pytest
+
+
+@pytest.fixture()
+def repository():
+    """
+    Fixture to provide a repository with two clubs, one competition
+    and two bookings.
+    """
+    clubs = [Club('Club A', 'a@mail.fr', 10), Club('Club B', 'b@mail.fr', 4)]
+    competitions = [Competition('Comp A', '2025-07-27 10:00:00', 20)]
+    bookings = [{'id': '1', 'club_id': 'a@mail.fr',
+                 'competition_id': 'Comp A', 'places': 3},
+                {'id': '2', 'club_id': 'a@mail.fr',
+                 'competition_id': 'Comp A', 'places': 2}]
+    return Repository(clubs, competitions, bookings)
+
+
+def test_lookups(repository):
+    assert repository.club_by_email('b@mail.fr').name == 'Club B'
+    assert repository.club_by_name('Club A').email == 'a@mail.fr'
+    assert repository.competition_by_name('Comp A').numberOfPlaces == 20
+    assert repository.club_by_email('unknown@mail.fr') is None
+    assert repository.competition_by_name('Unknown') is None
+
+
+def test_booked_places(repository):
+    assert repository.booked_places('a@mail.fr', 'Comp A') == 5
+    assert repository.booked_places('b@mail.fr', 'Comp A') == 0
+
+    repository.add_booking({'id': '3', 'club_id': 'b@mail.fr',
+                            'competition_id': 'Comp A', 'places': 4})
+    assert repository.booked_places('b@mail.fr', 'Comp A') == 4
+    assert repository.bookings_count == 3
+
+
+def test_loaded_totals():
+    """
+    The totals loaded by the storage are counted with the bookings.
+    """
+    repository = Repository([], [], [{'id': '2', 'club_id': 'a@mail.fr',
+                                      'competition_id': 'Comp A',
+                                      'places': 1}],
+                            booked={('a@mail.fr', 'Comp A'): 4},
+                            bookings_count=2)
+    assert repository.booked_places('a@mail.fr', 'Comp A') == 5
+    assert repository.bookings_count == 3
+
+
+@pytest.fixture()
+def calendar():
+    """
+    Fixture to provide a repository with one competition per month of
+    2025, in a random order, the even months are full.
+    """
+    competitions = [Competition(f'Comp {month}',
+                                f'2025-{month:02}-10 10:00:00', month % 2)
+                    for month in (5, 1, 12, 3, 8, 2, 11, 4, 7, 10, 6, 9)]
+    return Repository([], competitions, [])
+
+
+def names(page):
+    competitions, has_next = page
+    return [c.name for c in competitions], has_next
+
+
+def test_list_competitions_pages(calendar):
+    assert names(calendar.list_competitions(page=1, per_page=5)) == (
+        ['Comp 1', 'Comp 2', 'Comp 3', 'Comp 4', 'Comp 5'], True)
+    assert names(calendar.list_competitions(page=3, per_page=5)) == (
+        ['Comp 11', 'Comp 12'], False)
+    assert names(calendar.list_competitions(page=4, per_page=5)) == (
+        [], False)
+
+
+def test_list_competitions_filters(calendar):
+    start = datetime(2025, 3, 1)
+    end = datetime(2025, 6, 10, 10)
+    assert names(calendar.list_competitions(start=start, end=end)) == (
+        ['Comp 3', 'Comp 4', 'Comp 5', 'Comp 6'], False)
+    assert names(calendar.list_competitions(per_page=2, has_places=True,
+                                            start=start)) == (
+        ['Comp 3', 'Comp 5'], True)
+    assert names(calendar.list_competitions(page=3, per_page=2,
+                                            has_places=True)) == (
+        ['Comp 9', 'Comp 11'], False)
+
+
+def test_report_totals(repository):
+    """
+    The places sold, points spent and places by day follow the bookings.
+    """
+    assert repository.sold == {'Comp A': 5}
+    assert repository.spent == {'a@mail.fr': 5}
+
+    repository.add_booking({'id': '3', 'club_id': 'b@mail.fr',
+                            'competition_id': 'Comp A', 'places': 4,
+                            'date': '2026-10-18 09:00:00'})
+    repository.add_booking({'id': '4', 'club_id': 'a@mail.fr',
+                            'competition_id': 'Comp A', 'places': -2,
+                            'date': '2026-10-18 10:00:00'})
+    assert repository.sold == {'Comp A': 7}
+    assert repository.spent == {'a@mail.fr': 3, 'b@mail.fr': 4}
+    assert repository.booked_by_day == {'2026-10-18': 2}
+
+    repository.set_booked('b@mail.fr', 'Comp A', 6)
+    assert repository.sold == {'Comp A': 9}
+    assert repository.spent == {'a@mail.fr': 3, 'b@mail.fr': 6}
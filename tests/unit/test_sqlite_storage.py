@@ -0,0 +1,241 @@
+import sqlite3
+from unittest.mock import patch
+from repository import Repository
+from sqlite_storage import SQLiteStorage
+from models import Club, Competition
+from server import app
+import pytest
+
+
+def booking(number, places):
+    return {'id': str(number), 'club_id': 'a@mail.fr',
+            'competition_id': 'Comp A', 'places': places}
+
+
+@pytest.fixture()
+def db_path(tmp_path):
+    """
+    Fixture to provide a database with one club, one competition
+    and one booking.
+    """
+    path = str(tmp_path / 'gudlft.db')
+    database = SQLiteStorage(path)
+    database.import_data(
+        [Club('Club A', 'a@mail.fr', 13)],
+        [Competition('Comp A', '2025-07-27 10:00:00', 25)],
+        [booking(1, 2)])
+    database.close()
+    return path
+
+
+def test_load(db_path):
+    database = SQLiteStorage(db_path)
+    assert database.connection().execute(
+        'PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert database.load_clubs() == [Club('Club A', 'a@mail.fr', 13)]
+    assert database.load_competitions() == [
+        Competition('Comp A', '2025-07-27 10:00:00', 25)]
+    assert list(database.iter_bookings()) == [booking(1, 2)]
+    assert database.load_booked() == ({('a@mail.fr', 'Comp A'): 2}, 1)
+
+
+def test_save_booking(db_path):
+    database = SQLiteStorage(db_path)
+    club = database.load_clubs()[0]
+    competition = database.load_competitions()[0]
+    assert database.save_booking(club, competition, booking(2, 3))
+
+    assert database.load_clubs()[0].points == 10
+    assert database.load_competitions()[0].numberOfPlaces == 22
+    assert list(database.iter_bookings()) == [booking(1, 2), booking(2, 3)]
+
+
+@pytest.mark.parametrize("places", [11, 14])
+def test_refused_booking(db_path, places):
+    """
+    A booking over the club limit or the club points changes nothing.
+    """
+    database = SQLiteStorage(db_path)
+    club = database.load_clubs()[0]
+    competition = database.load_competitions()[0]
+    assert database.save_booking(club, competition,
+                                 booking(2, places)) is False
+    assert database.load_clubs()[0].points == 13
+    assert database.load_competitions()[0].numberOfPlaces == 25
+    assert list(database.iter_bookings()) == [booking(1, 2)]
+    assert database.load_booked() == ({('a@mail.fr', 'Comp A'): 2}, 1)
+
+
+def test_save_bookings_all_or_none(db_path):
+    """
+    A refused booking in a bulk rolls back the bookings before it.
+    """
+    database = SQLiteStorage(db_path)
+    club = database.load_clubs()[0]
+    competition = database.load_competitions()[0]
+    assert database.save_bookings(
+        club, [(competition, booking(2, 5)), (competition, booking(3, 6))]
+    ) is False
+    assert database.load_clubs()[0].points == 13
+    assert list(database.iter_bookings()) == [booking(1, 2)]
+
+    assert database.save_bookings(
+        club, [(competition, booking(2, 5)), (competition, booking(3, 5))])
+    assert database.load_clubs()[0].points == 3
+    assert database.load_competitions()[0].numberOfPlaces == 15
+
+
+def test_refresh_from_other_worker(db_path):
+    """
+    A booking saved by a worker is seen by the others on refresh.
+    """
+    worker1, worker2 = SQLiteStorage(db_path), SQLiteStorage(db_path)
+    booked, count = worker2.load_booked()
+    store = Repository(worker2.load_clubs(), worker2.load_competitions(),
+                       booked=booked, bookings_count=count)
+    club = store.club_by_email('a@mail.fr')
+    competition = store.competition_by_name('Comp A')
+    worker1.save_booking(club, competition, booking(2, 4))
+
+    worker2.refresh(store, club, competition)
+    assert club.points == 9
+    assert competition.numberOfPlaces == 21
+    assert store.booked_places('a@mail.fr', 'Comp A') == 6
+    # The version of the points is the id of the last booking
+    assert store.points_version('a@mail.fr') == '2'
+    assert worker1.load_points_versions() == {'a@mail.fr': '2'}
+
+
+def test_changes_from_other_worker(db_path):
+    """
+    A worker finds out from the version of the database that another
+    one changed the data, and which values.
+    """
+    worker1, worker2 = SQLiteStorage(db_path), SQLiteStorage(db_path)
+    booked, count = worker2.load_booked()
+    store = Repository(worker2.load_clubs(), worker2.load_competitions(),
+                       booked=booked, bookings_count=count)
+    club = store.club_by_email('a@mail.fr')
+    competition = store.competition_by_name('Comp A')
+    assert worker2.sync_version() is None
+
+    worker1.save_booking(club, competition, booking(2, 4))
+    version = worker2.sync_version()
+    assert version is not None
+    assert worker2.changes(store) == ([club], [competition],
+                                      [('a@mail.fr', 'Comp A')], [])
+    worker2.refresh(store, club, competition)
+    worker2.synced(version)
+    assert worker2.sync_version() is None
+    assert worker2.changes(store) == ([], [], [], [])
+
+
+def test_changes_read_from_log(db_path):
+    """
+    Only the club and competition booked since the last sync are read
+    again, the whole database is compared after an import or once the
+    versions since the last sync are pruned from the change log.
+    """
+    worker1, worker2 = SQLiteStorage(db_path), SQLiteStorage(db_path)
+    store = Repository(worker2.load_clubs(), worker2.load_competitions())
+    club = store.club_by_email('a@mail.fr')
+    competition = store.competition_by_name('Comp A')
+    # Out of date in memory, but not changed since the sync
+    store.set_booked('a@mail.fr', 'Comp A', 0)
+    assert worker2.changes(store) == ([], [], [], [])
+
+    worker1.import_data([Club('Club A', 'a@mail.fr', 12)], [], [])
+    assert worker2.changes(store) == ([club], [],
+                                      [('a@mail.fr', 'Comp A')], [])
+    worker2.synced(worker2.sync_version())
+    store.set_points(club, 12)
+    worker1.save_booking(club, competition, booking(2, 1))
+    worker2.connection().execute('DELETE FROM changes')
+    assert worker2.changes(store) == ([club], [competition],
+                                      [('a@mail.fr', 'Comp A')], [])
+
+
+def test_pages_follow_other_workers(db_path):
+    """
+    The clubs board of a worker shows the points changed by another one,
+    instead of answering 304 Not Modified from its own memory.
+    """
+    worker, other = SQLiteStorage(db_path), SQLiteStorage(db_path)
+    booked, count = worker.load_booked()
+    store = Repository(worker.load_clubs(), worker.load_competitions(),
+                       booked=booked, bookings_count=count)
+    with patch('server.storage', worker), patch('server.store', store), \
+            app.test_client() as client:
+        etag = client.get('/clubs.json').headers['ETag']
+        other.save_booking(other.load_clubs()[0],
+                           other.load_competitions()[0], booking(2, 4))
+        response = client.get('/clubs.json',
+                              headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json == {'clubs': [{'name': 'Club A', 'points': 9}]}
+    assert store.competition_by_name('Comp A').numberOfPlaces == 21
+
+
+def test_own_booking_keeps_version_synced(db_path):
+    """
+    The bookings of the worker itself don't call for a sync.
+    """
+    database = SQLiteStorage(db_path)
+    club = database.load_clubs()[0]
+    competition = database.load_competitions()[0]
+    assert database.save_booking(club, competition, booking(2, 3))
+    assert database.sync_version() is None
+
+
+def test_booked_by_day(db_path):
+    """
+    The dated bookings are totalled by day, the others left out.
+    """
+    database = SQLiteStorage(db_path)
+    club = database.load_clubs()[0]
+    competition = database.load_competitions()[0]
+    dated = dict(booking(2, 3), date='2026-10-18 09:00:00')
+    assert database.save_booking(club, competition, dated)
+    assert database.load_booked_by_day() == {'2026-10-18': 3}
+    assert list(database.iter_bookings()) == [booking(1, 2), dated]
+
+
+def test_days_from_other_worker(db_path):
+    """
+    The places booked by day by another worker are read again by the
+    sync, from the change log or the comparison of the whole database.
+    """
+    worker1, worker2 = SQLiteStorage(db_path), SQLiteStorage(db_path)
+    store = Repository(worker2.load_clubs(), worker2.load_competitions(),
+                       booked_by_day=worker2.load_booked_by_day())
+    club = store.club_by_email('a@mail.fr')
+    competition = store.competition_by_name('Comp A')
+    worker1.save_booking(club, competition,
+                         dict(booking(2, 3), date='2026-10-18 09:00:00'))
+    days = worker2.changes(store)[3]
+    assert days == ['2026-10-18']
+    worker2.refresh_day(store, '2026-10-18')
+    assert store.booked_by_day == {'2026-10-18': 3}
+
+    store.set_booked_by_day('2026-10-18', 1)
+    worker2.connection().execute('DELETE FROM changes')
+    assert worker2.changes(store)[3] == ['2026-10-18']
+
+
+def test_undated_database_upgraded(tmp_path):
+    """
+    A database created before the bookings were dated gets the column.
+    """
+    path = str(tmp_path / 'gudlft.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE bookings (id TEXT PRIMARY KEY, '
+                 'club_id TEXT NOT NULL, competition_id TEXT NOT NULL, '
+                 'places INTEGER NOT NULL)')
+    conn.execute("INSERT INTO bookings VALUES ('1', 'a@mail.fr', "
+                 "'Comp A', 2)")
+    conn.commit()
+    conn.close()
+
+    database = SQLiteStorage(path)
+    assert list(database.iter_bookings()) == [booking(1, 2)]
+    assert database.load_booked_by_day() == {}
@@ -0,0 +1,39 @@
+from unittest.mock import patch
+from jinja2 import FileSystemBytecodeCache
+import server
+from server import app
+
+
+def test_ready():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        response = client.get('/ready')
+        assert response.status_code == 200
+        assert response.json['ready'] is True
+        assert response.json['startup_seconds'] > 0
+
+
+def test_compile_templates_command(tmp_path):
+    """
+    Test the templates are compiled into the bytecode cache, and read
+    from it by the next compilation.
+    """
+    cache = FileSystemBytecodeCache(str(tmp_path))
+    with patch.object(app.jinja_env, 'bytecode_cache', cache), \
+            patch.dict(app.config, TEMPLATE_CACHE_DIR=str(tmp_path)):
+        result = app.test_cli_runner().invoke(args=['compile-templates'])
+        assert result.exit_code == 0
+        assert 'Compiled 5 templates' in result.output
+        assert len(list(tmp_path.iterdir())) == 5
+
+        app.jinja_env.cache.clear()
+        with patch.object(app.jinja_env, 'compile') as compile:
+            assert server.compile_templates()[0] == 5
+        assert not compile.called
+
+
+def test_compile_templates_command_without_cache():
+    with patch.object(app.jinja_env, 'bytecode_cache', None):
+        result = app.test_cli_runner().invoke(args=['compile-templates'])
+    assert result.exit_code == 1
+    assert 'TEMPLATE_CACHE_DIR is not set' in result.output
@@ -0,0 +1,137 @@
+from unittest.mock import patch
+from conftest import NEXT_YEAR
+from live_updates import Broadcaster
+from waitlist import Waitlist
+from models import Club, Competition
+from server import app
+import server
+import pytest
+
+
+def test_first_come_first_served():
+    waitlist = Waitlist()
+    assert waitlist.join('Comp A', 'a@mail.fr', 2) == 1
+    assert waitlist.join('Comp A', 'b@mail.fr', 1) == 2
+    assert waitlist.join('Comp A', 'a@mail.fr', 3) == 2
+    assert waitlist.first('Comp A') == ('a@mail.fr', 3)
+    assert waitlist.leave('Comp A', 'a@mail.fr')
+    assert not waitlist.leave('Comp A', 'a@mail.fr')
+    assert waitlist.first('Comp A') == ('b@mail.fr', 1)
+    assert waitlist.count('Comp A') == 1
+    assert waitlist.first('Comp B') is None
+
+
+def test_left_entries_skipped():
+    waitlist = Waitlist()
+    for n in range(5):
+        waitlist.join('Comp A', f'{n}@mail.fr', 1)
+    for n in range(4):
+        waitlist.leave('Comp A', f'{n}@mail.fr')
+    assert waitlist.first('Comp A') == ('4@mail.fr', 1)
+    assert waitlist.waiting('Comp A', '4@mail.fr') == 1
+    assert waitlist.waiting('Comp A', '0@mail.fr') is None
+
+
+@pytest.fixture()
+def clients(make_client):
+    """
+    Fixture to provide three logged in clients on a competition with
+    4 places, the first club has booked them all.
+    """
+    clubs = [Club(f'Club {n}', f'{n}@mail.fr', 20) for n in range(3)]
+    _, store, _ = make_client(
+        clubs, [Competition('Comp A', NEXT_YEAR, 0)],
+        [{'id': '1', 'club_id': '0@mail.fr', 'competition_id': 'Comp A',
+          'places': 4}])
+    live = Broadcaster()
+    with patch('server.waitlist', Waitlist()), patch('server.live', live):
+        clients = [app.test_client() for _ in clubs]
+        for client, club in zip(clients, clubs):
+            client.post('/show_summary', data={'email': club.email})
+        yield clients, store, live
+
+
+def post(client, url, places):
+    return client.post(url, data={'competition': 'Comp A',
+                                  'places': str(places)})
+
+
+def test_refused_booking_offers_waitlist(clients):
+    clients, _, _ = clients
+    page = clients[1].post('/purchase_places', data={
+        'club': 'Club 1', 'competition': 'Comp A', 'places': '2'}
+    ).get_data(as_text=True)
+    assert 'The competition you chose is not available anymore' in page
+    assert 'Join the waitlist for 2 places' in page
+
+
+def test_cancel_fills_waitlist_in_turn(clients):
+    clients, store, live = clients
+    post(clients[1], '/waitlist', 3)
+    page = post(clients[2], '/waitlist', 1).get_data(as_text=True)
+    assert 'You are on the waitlist of Comp A for 1 places, 2 clubs' in page
+    subscriber = live.subscribe()
+
+    page = post(clients[0], '/cancel_places', 2).get_data(as_text=True)
+    assert '2 places cancelled' in page
+    competition = store.competition_by_name('Comp A')
+    # Club 1 is first and waits for 3 places, club 2 waits behind it
+    assert competition.numberOfPlaces == 2
+    assert store.booked_places('2@mail.fr', 'Comp A') == 0
+
+    post(clients[0], '/cancel_places', 2)
+    assert store.booked_places('1@mail.fr', 'Comp A') == 3
+    assert store.booked_places('2@mail.fr', 'Comp A') == 1
+    assert store.club_by_email('0@mail.fr').points == 24
+    assert competition.numberOfPlaces == 0
+    events = []
+    while not subscriber.empty():
+        events.append(subscriber.get()[1])
+    waitlist_events = [text for text in events if 'event: waitlist' in text]
+    assert len(waitlist_events) == 2
+    assert '"club":"Club 1","competition":"Comp A","places":3,' \
+        '"error":null' in waitlist_events[0]
+
+
+def test_cancel_more_than_booked(clients):
+    clients, store, _ = clients
+    page = post(clients[1], '/cancel_places', 1).get_data(as_text=True)
+    assert 'You have only 0 places booked for this competition' in page
+    assert store.competition_by_name('Comp A').numberOfPlaces == 0
+
+
+@pytest.mark.parametrize("points, booked, places, message", [
+    (2, 0, 3, 'Sorry, you do not have enough points to book this '
+     'competition'),
+    (20, 10, 3, 'You can not book more than 12 places for this '
+     'competition')])
+def test_join_refused(clients, points, booked, places, message):
+    clients, store, _ = clients
+    store.club_by_email('1@mail.fr').points = points
+    store.booked[('1@mail.fr', 'Comp A')] = booked
+    page = post(clients[1], '/waitlist', places).get_data(as_text=True)
+    assert message in page
+    assert 'You are on the waitlist' not in page
+    assert server.waitlist.count('Comp A') == 0
+
+
+def test_unfillable_first_club_dropped(clients):
+    """
+    Test a waiting club that spent its points meanwhile is dropped, and
+    the club behind it gets the places.
+    """
+    clients, store, live = clients
+    post(clients[1], '/waitlist', 3)
+    post(clients[2], '/waitlist', 2)
+    store.club_by_email('1@mail.fr').points = 1
+    subscriber = live.subscribe()
+
+    post(clients[0], '/cancel_places', 2)
+    assert store.booked_places('1@mail.fr', 'Comp A') == 0
+    assert store.booked_places('2@mail.fr', 'Comp A') == 2
+    assert server.waitlist.count('Comp A') == 0
+    events = []
+    while not subscriber.empty():
+        events.append(subscriber.get()[1])
+    assert any('"club":"Club 1"' in text and 'enough points' in text
+               for text in events if 'event: waitlist' in text)
@@ -0,0 +1,74 @@
+import heapq
+import itertools
+import threading
+from collections import defaultdict
+
+
+class Waitlist:
+    """
+    Clubs waiting for places of the competitions, first come, first
+    served.
+    Each competition has a heap of [sequence, club email, places]
+    entries. Leaving only marks the entry, which is dropped once it
+    reaches the top, so joining, leaving and taking the first club are
+    O(log n).
+    """
+
+    def __init__(self):
+        self._heaps = defaultdict(list)
+        self._entries = {}
+        self._counts = defaultdict(int)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def join(self, competition_id, club_id, places):
+        """
+        Add the club at the end of the waitlist of the competition, or
+        change the places it waits for without losing its turn.
+        Return the number of clubs waiting.
+        """
+        with self._lock:
+            entry = self._entries.get((competition_id, club_id))
+            if entry is not None:
+                entry[2] = places
+            else:
+                entry = [next(self._sequence), club_id, places]
+                self._entries[(competition_id, club_id)] = entry
+                heapq.heappush(self._heaps[competition_id], entry)
+                self._counts[competition_id] += 1
+            return self._counts[competition_id]
+
+    def leave(self, competition_id, club_id):
+        """
+        Remove the club from the waitlist, return False if not waiting.
+        """
+        with self._lock:
+            entry = self._entries.pop((competition_id, club_id), None)
+            if entry is None:
+                return False
+            entry[1] = None
+            self._counts[competition_id] -= 1
+            return True
+
+    def first(self, competition_id):
+        """
+        Return the (club email, places) of the first club waiting for the
+        competition, or None.
+        """
+        with self._lock:
+            heap = self._heaps.get(competition_id)
+            while heap and heap[0][1] is None:
+                heapq.heappop(heap)
+            if not heap:
+                return None
+            return heap[0][1], heap[0][2]
+
+    def waiting(self, competition_id, club_id):
+        """
+        Return the places the club waits for, or None.
+        """
+        entry = self._entries.get((competition_id, club_id))
+        return None if entry is None else entry[2]
+
+    def count(self, competition_id):
+        return self._counts.get(competition_id, 0)